@@ -0,0 +1,85 @@
+"""
+Import-time regression check for the Scraplet command line.
+
+Runs the lightweight entry points (plain import, --help-mode, --list-configs)
+in fresh interpreters and fails when one of them imports a heavy dependency or
+takes longer than the startup budget.
+
+Usage:
+    python benchmarks/check_startup.py [--budget-ms 150] [--runs 5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["playwright", "pandas", "requests", "bs4", "lxml", "pyarrow", "openpyxl"]
+DEFAULT_BUDGET_MS = 150
+
+PROBE = """
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+import scraplet
+argv = json.loads(sys.argv[1])
+if argv:
+    sys.argv = ["scraplet.py"] + argv
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            scraplet.main()
+        except SystemExit:
+            pass
+elapsed = (time.perf_counter() - start) * 1000
+heavy = json.loads(sys.argv[2]) if len(sys.argv) > 2 else []
+print(json.dumps({"ms": elapsed, "loaded": [m for m in heavy if m in sys.modules]}))
+"""
+
+ENTRY_POINTS = {
+    "import scraplet": [],
+    "--help-mode": ["--help-mode"],
+    "--list-configs": ["--list-configs"],
+}
+
+
+def probe(argv):
+    """
+    Run one entry point in a fresh interpreter and return its timing and the
+    heavy modules it loaded
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(argv), json.dumps(HEAVY_MODULES)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check Scraplet startup time")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    failed = False
+    for name, argv in ENTRY_POINTS.items():
+        results = [probe(argv) for _ in range(args.runs)]
+        best = min(result["ms"] for result in results)
+        loaded = sorted({module for result in results for module in result["loaded"]})
+
+        if loaded:
+            failed = True
+            print(f"ERROR: {name} imports heavy modules: {', '.join(loaded)}")
+        elif best > args.budget_ms:
+            failed = True
+            print(f"ERROR: {name} took {best:.1f}ms (budget {args.budget_ms:.0f}ms)")
+        else:
+            print(f"SUCCESS: {name}: {best:.1f}ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Generated fixture pages and a local HTTP server for the benchmark suite.
+
+Every fixture is a listing of `count` items with a title and a price. Static
+fixtures ship the items in the HTML; JS fixtures build the same DOM from an
+inline script, so they need a browser to be scraped.
+
+URLs look like /<kind>/<count>/<page>.html where kind is "static" or "js".
+"""
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+KINDS = ["static", "js"]
+SIZES = [10, 1000, 10000, 50000]
+SELECTORS = ".item .title||.item .price"
+COLUMNS = len(SELECTORS.split("||"))
+
+
+@lru_cache(maxsize=None)
+def static_page(count):
+    items = "".join(
+        f'<li class="item"><span class="title">Item {i}</span>'
+        f'<span class="price">${i}.99</span></li>'
+        for i in range(count)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Static fixture</title></head>"
+        f'<body><ul id="items">{items}</ul></body></html>'
+    ).encode("utf-8")
+
+
+@lru_cache(maxsize=None)
+def js_page(count):
+    script = f"""
+    const list = document.getElementById("items");
+    const fragment = document.createDocumentFragment();
+    for (let i = 0; i < {count}; i++) {{
+        const item = document.createElement("li");
+        item.className = "item";
+        item.innerHTML = `<span class="title">Item ${{i}}</span><span class="price">$${{i}}.99</span>`;
+        fragment.appendChild(item);
+    }}
+    list.appendChild(fragment);
+    """
+    return (
+        "<!DOCTYPE html><html><head><title>JS fixture</title></head>"
+        f'<body><ul id="items"></ul><script>{script}</script></body></html>'
+    ).encode("utf-8")
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            kind, count, _ = self.path.strip("/").split("/")
+            if kind not in KINDS:
+                raise ValueError(kind)
+            count = int(count)
+            body = static_page(count) if kind == "static" else js_page(count)
+        except ValueError:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Serve fixture pages from 127.0.0.1 on a free port in a background thread
+    """
+
+    def __init__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, kind, count, page=0):
+        return f"{self.base_url}/{kind}/{count}/{page}.html"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,311 @@
+"""
+Offline benchmark suite for Scraplet.
+
+Serves generated fixture pages (10 to 50k matching elements, static and
+JS-rendered) from a local HTTP server and runs every scenario in a fresh
+interpreter, measuring pages/sec, p50/p99 page latency and peak RSS. Export
+time is measured per output format on the largest fixture.
+
+Results are written as JSON together with the commit they were taken at.
+Passing a previous results file with --compare reports every metric that got
+worse by more than --threshold and exits with status 1, so regressions fail CI.
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --quick --compare results.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fixtures import COLUMNS, SELECTORS, SIZES, FixtureServer  # noqa: E402
+
+# (engine, fixture kind) pairs; the static engine cannot see JS-rendered items
+SCRAPE_SCENARIOS = [
+    ("static", "static"),
+    ("auto", "static"),
+    ("browser", "static"),
+    ("auto", "js"),
+    ("browser", "js"),
+]
+EXPORT_FORMATS = ["csv", "jsonl", "parquet", "json", "excel"]
+QUICK_SIZES = [10, 1000]
+
+# Time differences below this are treated as noise when comparing runs
+NOISE_FLOOR = {"p50_ms": 5.0, "p99_ms": 5.0, "peak_rss_mb": 5.0, "export_sec": 0.005}
+
+# Metric name -> True when higher is better
+METRICS = {
+    "pages_per_sec": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+    "export_sec": False,
+}
+
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process and of its largest finished child
+    (the browser) in megabytes
+    """
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return round(own, 1), round(children, 1)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def scrape_scenario(base_url, engine, kind, size, pages, concurrency):
+    """
+    Scrape `pages` copies of one fixture through the regular batch pipeline
+    """
+    from browser import scrape_urls
+    from extract import get_selectors
+    from scraplet import build_parser
+
+    options = build_parser().parse_args(
+        ["--engine", engine, "--concurrency", str(concurrency), "--no-prompt", "--no-daemon"]
+    )
+    selectors = get_selectors(SELECTORS)
+    urls = [f"{base_url}/{kind}/{size}/{page}.html" for page in range(pages)]
+
+    async def collect():
+        latencies, errors, elements = [], [], 0
+        async for result in scrape_urls(urls, selectors, options):
+            latencies.append(sum(result["metrics"]["timings"].values()))
+            if result["error"]:
+                errors.append(result["error"])
+            else:
+                elements += sum(result["metrics"]["elements"].values())
+        return latencies, errors, elements
+
+    start = time.perf_counter()
+    latencies, errors, elements = asyncio.run(collect())
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "pages": pages,
+        "errors": len(errors),
+        "elements_ok": elements == pages * size * COLUMNS,
+        "pages_per_sec": round(pages / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+    if errors:
+        result["first_error"] = errors[0].splitlines()[0]
+    return result
+
+
+def export_scenario(output, size):
+    """
+    Export one page worth of data for the largest fixture in one output format
+    """
+    from scraplet import export_data
+
+    data = {
+        ".item .title": [f"Item {i}" for i in range(size)],
+        ".item .price": [f"${i}.99" for i in range(size)],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Warm up so one-off imports (pandas, pyarrow) are not timed
+            export_data({key: values[:1] for key, values in data.items()}, output)
+            start = time.perf_counter()
+            export_data(data, output)
+            elapsed = time.perf_counter() - start
+    return {"rows": size, "export_sec": round(elapsed, 4)}
+
+
+def run_worker(scenario):
+    """
+    Entry point of the child interpreter running one scenario
+    """
+    try:
+        if scenario["type"] == "scrape":
+            result = scrape_scenario(
+                scenario["base_url"],
+                scenario["engine"],
+                scenario["kind"],
+                scenario["size"],
+                scenario["pages"],
+                scenario["concurrency"],
+            )
+        else:
+            result = export_scenario(scenario["output"], scenario["size"])
+    except Exception as e:
+        # e.g. Chromium is not installed: report it instead of a traceback
+        print(json.dumps({"error": (str(e).strip().splitlines() or [repr(e)])[0]}))
+        return
+
+    own, browser = peak_rss_mb()
+    result["peak_rss_mb"] = own
+    result["browser_peak_rss_mb"] = browser
+    print(json.dumps(result))
+
+
+def run_in_subprocess(scenario):
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", json.dumps(scenario)],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        lines = process.stderr.strip().splitlines() or ["unknown error"]
+        return {"error": lines[-1]}
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def pages_for(size, pages):
+    # Keep the 10k/50k fixtures from dominating the run time
+    return max(2, pages // max(1, size // 1000)) if size >= 10000 else pages
+
+
+def run_suite(args):
+    sizes = args.sizes or (QUICK_SIZES if args.quick else SIZES)
+    pages = args.pages or (5 if args.quick else 20)
+    results = {}
+
+    with FixtureServer() as server:
+        for engine, kind in SCRAPE_SCENARIOS:
+            if engine not in args.engines:
+                continue
+            for size in sizes:
+                name = f"scrape:{engine}:{kind}:{size}"
+                print(f"Running {name}...")
+                results[name] = run_in_subprocess(
+                    {
+                        "type": "scrape",
+                        "base_url": server.base_url,
+                        "engine": engine,
+                        "kind": kind,
+                        "size": size,
+                        "pages": pages_for(size, pages),
+                        "concurrency": args.concurrency,
+                    }
+                )
+                print_result(name, results[name])
+
+    for output in EXPORT_FORMATS:
+        name = f"export:{output}:{max(sizes)}"
+        print(f"Running {name}...")
+        results[name] = run_in_subprocess({"type": "export", "output": output, "size": max(sizes)})
+        print_result(name, results[name])
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def print_result(name, result):
+    if "error" in result:
+        print(f"  ERROR: {result['error']}")
+        return
+    shown = [f"{metric}={result[metric]}" for metric in METRICS if metric in result]
+    if result.get("errors"):
+        shown.append(f"errors={result['errors']} ({result.get('first_error', '')})")
+    print("  " + "  ".join(shown))
+
+
+def compare(current, baseline, threshold):
+    """
+    Return a line for every metric that got worse than the baseline by more
+    than threshold (a fraction)
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline["results"].get(name)
+        if not previous or "error" in result or "error" in previous:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in result or not previous.get(metric):
+                continue
+            if abs(result[metric] - previous[metric]) < NOISE_FLOOR.get(metric, 0):
+                continue
+            change = (result[metric] - previous[metric]) / previous[metric]
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append(
+                    f"{name} {metric}: {previous[metric]} -> {result[metric]} ({change:+.0%})"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraplet offline benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="Small sizes and few pages")
+    parser.add_argument("--sizes", type=int, nargs="+", help=f"Fixture sizes (default: {SIZES})")
+    parser.add_argument("--pages", type=int, help="Pages per scenario (default: 20, 5 with --quick)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--engines",
+        default="static,auto,browser",
+        type=lambda value: value.split(","),
+        help="Comma separated engines to benchmark (default: static,auto,browser)",
+    )
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed regression (default: 0.10)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(json.loads(args.worker))
+        return
+
+    report = run_suite(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"SUCCESS: Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')}):")
+        if regressions:
+            for line in regressions:
+                print(f"  REGRESSION: {line}")
+            sys.exit(1)
+        print("  No regressions above the threshold.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,930 @@
+import asyncio
+import copy
+import fnmatch
+import functools
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+# Playwright is imported where it is used so runs that never start a browser
+# (static engine, --help-mode, --list-configs) don't pay for importing it.
+
+from extract import (
+    EXTRACT_SCRIPT,
+    LINKS_SCRIPT,
+    NOT_FOUND,
+    RECORD_SCRIPT,
+    SCROLL_SCRIPT,
+    URL_ATTRIBUTES,
+    WAIT_SCRIPT,
+)
+from menu import handle_selector_error
+from cache import open_cache
+from daemon import find_browser_daemon
+from metrics import PageMetrics
+from static import (
+    create_session,
+    document_base,
+    fetch_page,
+    parse_html,
+    select_links,
+    select_records,
+    select_texts,
+)
+from sources import ThreadedUrls
+from throttle import Throttle
+
+PAGE_TIMEOUT = 30000
+SELECTOR_TIMEOUT = 10000
+DEFAULT_CONCURRENCY = 4
+DEFAULT_SCROLL_TIMEOUT = 30000
+DEFAULT_SCROLL_IDLE = 2000
+# Idle warm contexts beyond this many are closed, least recently used first
+MAX_WARM_CONTEXTS = 16
+ENGINES = ["browser", "static", "auto"]
+SETTLE_STRATEGIES = ["all", "any", "quorum"]
+WAIT_UNTIL = ["load", "domcontentloaded", "commit", "networkidle"]
+RESOURCE_TYPES = [
+    "document",
+    "stylesheet",
+    "image",
+    "media",
+    "font",
+    "script",
+    "texttrack",
+    "xhr",
+    "fetch",
+    "eventsource",
+    "websocket",
+    "manifest",
+    "other",
+]
+DEFAULT_BLOCKED_RESOURCES = ["image", "media", "font"]
+
+
+class BrowserPool:
+    """
+    One long-lived Chromium instance handing out a bounded number of pages.
+    Chromium is only launched when the first page is requested, or attached
+    from the browser daemon at endpoint when one is given.
+    """
+
+    def __init__(self, size=DEFAULT_CONCURRENCY, headless=True, endpoint=None):
+        self.size = size
+        self.headless = headless
+        self.endpoint = endpoint
+        self.browser = None
+        self._playwright = None
+        self._slots = asyncio.Semaphore(size)
+        self._fetches = asyncio.Semaphore(size)
+        self._start_lock = asyncio.Lock()
+        self._states = {}
+        self._changed_states = set()
+        self._warm = OrderedDict()
+        self._warm_users = Counter()
+        self._warm_lock = asyncio.Lock()
+        self._har_parts = {}
+
+    async def start(self):
+        async with self._start_lock:
+            if self.browser is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+                if self.endpoint:
+                    try:
+                        self.browser = await self._playwright.chromium.connect_over_cdp(
+                            self.endpoint
+                        )
+                    except Exception as e:
+                        print(f"WARNING: Could not attach to browser daemon ({e})")
+                        self.endpoint = None
+                if self.browser is None:
+                    self.browser = await self._playwright.chromium.launch(
+                        headless=self.headless
+                    )
+        return self
+
+    async def close(self):
+        """
+        Close the warm contexts, merge the HAR archives recorded by the
+        contexts and write the storage state they ended with back to the
+        options' storage state files, then close or detach from the browser
+        """
+        for key in list(self._warm):
+            await self._close_warm(key)
+        for path, parts in self._har_parts.items():
+            try:
+                merge_har_files(path, parts)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Could not save HAR archive to {path}: {e}")
+        self._har_parts.clear()
+        for path in self._changed_states:
+            try:
+                write_storage_state(path, self._states[path])
+            except OSError as e:
+                print(f"WARNING: Could not save storage state to {path}: {e}")
+        self._changed_states.clear()
+
+        # For an attached daemon this only disconnects and leaves it running
+        if self.browser is not None and self.browser.is_connected():
+            await self.browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self.browser = None
+        self._playwright = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def fetch(self, session, url):
+        """
+        Fetch a page without the browser, waiting while size fetches are in
+        flight, so pages scraped without a browser are bounded like the rest
+        """
+        async with self._fetches:
+            return await asyncio.to_thread(fetch_page, session, url)
+
+    @asynccontextmanager
+    async def page(self, options=None, url=None):
+        """
+        Borrow a page, waiting while all slots are in use. The page gets a
+        fresh context, or the warm context of the URL's site when the options
+        enable reuse_context. Requests are blocked according to the options'
+        block settings.
+        """
+        async with self._slots:
+            await self.start()
+            if url is not None and getattr(options, "reuse_context", False):
+                key = warm_context_key(url, options)
+                context = await self._warm_context(key, options)
+                page = await context.new_page()
+                try:
+                    yield page
+                finally:
+                    self._warm_users[key] -= 1
+                    await page.close()
+                return
+
+            context = await self.new_context(options)
+            try:
+                yield await context.new_page()
+            finally:
+                await self._keep_state(context, options)
+                await context.close()
+
+    async def new_context(self, options=None):
+        """
+        Open a browser context with the options' storage state, HAR recording
+        or replay, and blocking. Recording contexts each write a part that
+        close merges into the archive; replaying contexts never touch the
+        network.
+        """
+        settings = {}
+        state = self._storage_state(options)
+        if state is not None and (state["cookies"] or state["origins"]):
+            settings["storage_state"] = copy.deepcopy(state)
+        record_har = getattr(options, "record_har", None)
+        if record_har:
+            # Every context writes its own archive; they are merged on close
+            parts = self._har_parts.setdefault(record_har, [])
+            parts.append(f"{record_har}.{len(parts)}.part")
+            settings["record_har_path"] = parts[-1]
+            settings["record_har_content"] = "embed"
+        context = await self.browser.new_context(**settings)
+        replay_har = getattr(options, "replay_har", None)
+        if replay_har:
+            # Requests missing from the archive fail instead of going online
+            await context.route_from_har(replay_har, not_found="abort")
+        blocker = resource_blocker(options)
+        if blocker is not None:
+            await context.route("**/*", blocker)
+        return context
+
+    def _storage_state(self, options):
+        path = getattr(options, "storage_state", None)
+        if not path:
+            return None
+        if path not in self._states:
+            self._states[path] = load_storage_state(path)
+        return self._states[path]
+
+    async def _keep_state(self, context, options):
+        """
+        Merge what a context ended with into its storage state, so later
+        contexts of the run start from it and it is saved on close
+        """
+        state = self._storage_state(options)
+        if state is None:
+            return
+        try:
+            merge_storage_state(state, await context.storage_state())
+        except Exception:
+            return
+        self._changed_states.add(options.storage_state)
+
+    async def _warm_context(self, key, options):
+        async with self._warm_lock:
+            if key in self._warm:
+                self._warm.move_to_end(key)
+            else:
+                self._warm[key] = (await self.new_context(options), options)
+            self._warm_users[key] += 1
+            idle = [k for k in self._warm if k != key and not self._warm_users[k]]
+            for old_key in idle[: max(0, len(self._warm) - MAX_WARM_CONTEXTS)]:
+                await self._close_warm(old_key)
+            return self._warm[key][0]
+
+    async def _close_warm(self, key):
+        context, options = self._warm.pop(key)
+        del self._warm_users[key]
+        await self._keep_state(context, options)
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+
+def warm_context_key(url, options):
+    """
+    Pages share a warm context when they are on the same site and need the
+    same storage state and blocking
+    """
+    return (
+        urlsplit(url).netloc,
+        getattr(options, "storage_state", None),
+        tuple(getattr(options, "block", None) or ()),
+        tuple(getattr(options, "block_urls", None) or ()),
+        getattr(options, "record_har", None),
+        getattr(options, "replay_har", None),
+    )
+
+
+def load_storage_state(path):
+    """
+    Read a storage state file (cookies and local storage per origin) as saved
+    by write_storage_state or Playwright. A missing file is an empty state.
+    """
+    state = {"cookies": [], "origins": []}
+    try:
+        with open(path, "r") as f:
+            saved = json.load(f)
+    except FileNotFoundError:
+        return state
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not load storage state from {path}: {e}")
+        return state
+    state["cookies"] = saved.get("cookies", [])
+    state["origins"] = saved.get("origins", [])
+    return state
+
+
+def merge_storage_state(state, update):
+    """
+    Fold a context's storage state into state. Cookies are matched by name,
+    domain and path and origins by their URL; the newer value wins.
+    """
+
+    def cookie_key(cookie):
+        return (cookie["name"], cookie["domain"], cookie["path"])
+
+    cookies = {cookie_key(cookie): cookie for cookie in state["cookies"]}
+    cookies.update((cookie_key(cookie), cookie) for cookie in update.get("cookies", []))
+    origins = {origin["origin"]: origin for origin in state["origins"]}
+    origins.update((origin["origin"], origin) for origin in update.get("origins", []))
+    state["cookies"] = list(cookies.values())
+    state["origins"] = list(origins.values())
+
+
+def merge_har_files(path, parts):
+    """
+    Combine the HAR archives recorded by several contexts into one archive at
+    path, then remove them. Parts a context never wrote are skipped.
+    """
+    merged = None
+    for part in parts:
+        try:
+            with open(part, "r", encoding="utf-8") as f:
+                log = json.load(f)["log"]
+        except FileNotFoundError:
+            continue
+        if merged is None:
+            merged = log
+        else:
+            merged.setdefault("pages", []).extend(log.get("pages", []))
+            merged["entries"].extend(log["entries"])
+    if merged is None:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"log": merged}, f)
+    for part in parts:
+        if os.path.exists(part):
+            os.remove(part)
+
+
+def write_storage_state(path, state):
+    # The file holds session cookies, so only the owner may read it. Worker
+    # processes sharing the file each write their own temporary copy.
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def url_matches(url, patterns):
+    """
+    Check a URL against patterns. Patterns with wildcards are matched as globs,
+    anything else as a plain substring.
+    """
+    for pattern in patterns:
+        if any(char in pattern for char in "*?["):
+            if fnmatch.fnmatch(url, pattern):
+                return True
+        elif pattern in url:
+            return True
+    return False
+
+
+def resource_blocker(options):
+    """
+    Build a route handler aborting requests for blocked resource types and URL
+    patterns. Returns None when nothing is blocked so no routing is installed.
+    """
+    blocked_types = set(getattr(options, "block", None) or [])
+    blocked_urls = getattr(options, "block_urls", None) or []
+    if not blocked_types and not blocked_urls:
+        return None
+
+    async def handle(route):
+        request = route.request
+        if request.resource_type in blocked_types or url_matches(request.url, blocked_urls):
+            await route.abort()
+        else:
+            await route.fallback()
+
+    return handle
+
+
+async def inner_texts(page, selector):
+    """
+    Return the text of every element matching a selector, one element at a time.
+    Only used for selectors the in-page extraction script cannot evaluate.
+    """
+    elements = await page.query_selector_all(selector)
+    return [await element.inner_text() for element in elements]
+
+
+async def extract_texts(page, selectors):
+    """
+    Extract the text of every element matching each selector in a single
+    page.evaluate round-trip. Returns a dictionary of selector -> list of text.
+    """
+    if not selectors:
+        return {}
+
+    columns = await page.evaluate(EXTRACT_SCRIPT, list(selectors))
+    for selector, values in columns.items():
+        if values is None:
+            columns[selector] = await inner_texts(page, selector)
+    return columns
+
+
+async def extract_records(page, container, fields):
+    """
+    Extract every record matching the container selector with all of its fields
+    in a single round-trip. Returns a dictionary of field name -> list of values,
+    all of equal length so rows stay aligned when a field is missing.
+    """
+    rows = await page.eval_on_selector_all(
+        container, RECORD_SCRIPT, {"fields": fields, "urlAttributes": URL_ATTRIBUTES}
+    )
+    return {field["name"]: [row[field["name"]] for row in rows] for field in fields}
+
+
+async def scroll_harvest(page, selectors, options, metrics):
+    """
+    Scroll the page and collect the selectors' matches, or the records in
+    record mode, as new items load. Everything happens in one page.evaluate
+    call that returns once the feed stops growing or a budget runs out.
+    """
+    harvest = await page.evaluate(
+        SCROLL_SCRIPT,
+        {
+            "selectors": list(selectors),
+            "record": options.record,
+            "fields": options.fields if options.record else [],
+            "urlAttributes": URL_ATTRIBUTES,
+            "maxItems": options.scroll_items or 0,
+            "timeout": options.scroll_timeout,
+            "idle": options.scroll_idle,
+        },
+    )
+    metrics.count("scroll_steps", harvest["steps"])
+    if options.record:
+        rows = harvest["rows"]
+        return {field["name"]: [row[field["name"]] for row in rows] for field in options.fields}
+
+    columns = harvest["columns"]
+    for selector, values in columns.items():
+        if values is None:
+            columns[selector] = await inner_texts(page, selector)
+    return columns
+
+
+async def extract_links(page, selector):
+    """
+    Absolute URLs of the links matching selector, in page order
+    """
+    return await page.eval_on_selector_all(selector, LINKS_SCRIPT)
+
+
+def parse_page(html, selectors, options, url=None):
+    """
+    Extract the selectors, or the records in record mode, from raw HTML or a
+    document from parse_html, plus the links to follow when crawling.
+    Relative URLs resolve against url, the address the page was served from,
+    or the document's <base href>.
+    Returns (columns, links); links is None unless the options have a follow
+    selector.
+    """
+    soup = parse_html(html) if isinstance(html, str) else html
+    url = document_base(soup, url)
+    if options.record:
+        columns = select_records(soup, options.record, options.fields, url)
+    else:
+        columns = select_texts(soup, selectors)
+    follow = getattr(options, "follow", None)
+    return columns, select_links(soup, follow, url) if follow else None
+
+
+def settle_count(selectors, settle="all", quorum=None):
+    """
+    Number of selectors that must be present before extraction starts.
+    A quorum defaults to a simple majority of the selectors.
+    """
+    if settle == "any":
+        return min(1, len(selectors))
+    if settle == "quorum":
+        return min(quorum or len(selectors) // 2 + 1, len(selectors))
+    return len(selectors)
+
+
+async def wait_for_selectors(page, selectors, settle="all", quorum=None, timeout=SELECTOR_TIMEOUT):
+    """
+    Wait for all selectors at the same time under one shared deadline.
+    Returns True once the settle strategy is satisfied, False on timeout.
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    needed = settle_count(selectors, settle, quorum)
+    try:
+        await page.wait_for_function(
+            WAIT_SCRIPT,
+            arg={"selectors": list(selectors), "needed": needed},
+            timeout=timeout,
+        )
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def extract_selectors(page, selectors, options, verbose=False, metrics=None):
+    """
+    Extract the text for every selector from an already loaded page.
+    The keys of the returned dictionary are selectors, values the scraped text.
+    Selectors that matched nothing are reported together once extraction is
+    done and, unless prompting is disabled, offered for a retry.
+    """
+    metrics = metrics or PageMetrics()
+    if options.record:
+        if verbose:
+            print(f"Waiting for records: {options.record}")
+        with metrics.phase("wait"):
+            settled = await wait_for_selectors(
+                page, [options.record], timeout=options.wait_timeout
+            )
+    else:
+        if verbose:
+            print(f"Waiting for {len(selectors)} selector(s) (settle: {options.settle})...")
+        with metrics.phase("wait"):
+            settled = await wait_for_selectors(
+                page, selectors, options.settle, options.quorum, options.wait_timeout
+            )
+    if verbose and not settled:
+        print("WARNING: Timed out waiting for selectors, extracting what is available")
+
+    if options.scroll:
+        if verbose:
+            print("Scrolling to load more items...")
+        with metrics.phase("scroll"):
+            columns = await scroll_harvest(page, selectors, options, metrics)
+    else:
+        with metrics.phase("extract"):
+            if options.record:
+                columns = await extract_records(page, options.record, options.fields)
+            else:
+                columns = await extract_texts(page, selectors)
+    missing = [selector for selector in selectors if not columns[selector]]
+    metrics.count_elements(columns, missing)
+
+    if verbose:
+        for selector in selectors:
+            if columns[selector]:
+                print(f"SUCCESS: Found {len(columns[selector])} elements for: {selector}")
+        if missing:
+            print(f"ERROR: {len(missing)} selector(s) not found: {', '.join(missing)}")
+
+    scraped_data = {}
+    for selector in selectors:
+        if columns[selector]:
+            scraped_data[selector] = columns[selector]
+            continue
+
+        # Offer to retry with a different selector, except for record fields
+        if options.prompt and not options.record:
+            new_selector = handle_selector_error(selector, page)
+        else:
+            new_selector = None
+        if new_selector:
+            try:
+                await page.wait_for_selector(new_selector, timeout=options.wait_timeout)
+                scraped_data[new_selector] = (await extract_texts(page, [new_selector]))[
+                    new_selector
+                ]
+                print(
+                    f"SUCCESS: Found {len(scraped_data[new_selector])} elements with new selector"
+                )
+            except Exception:
+                scraped_data[new_selector] = [NOT_FOUND]
+        else:
+            scraped_data[selector] = [NOT_FOUND]
+
+    return scraped_data
+
+
+def mark_missing(columns):
+    """
+    Replace the columns of selectors that matched nothing with the not-found marker
+    """
+    return {selector: values or [NOT_FOUND] for selector, values in columns.items()}
+
+
+def report_missing(columns):
+    """
+    Print every selector that matched nothing in one line
+    """
+    missing = [selector for selector, values in columns.items() if not values]
+    if missing:
+        print(f"ERROR: {len(missing)} selector(s) not found: {', '.join(missing)}")
+
+
+def count_response_bytes(metrics):
+    """
+    Build a response listener adding each response's Content-Length to the
+    page's byte counter
+    """
+
+    def on_response(response):
+        try:
+            metrics.count("bytes", int(response.headers.get("content-length", 0)))
+        except ValueError:
+            pass
+
+    return on_response
+
+
+async def cache_page(cache, url, options, html, headers, final_url):
+    """
+    Store a snapshot of the page in the cache. The page was scraped either
+    way, so a cache that cannot be written only warns.
+    """
+    try:
+        await asyncio.to_thread(cache.store, url, options, html, headers, final_url)
+    except Exception as e:
+        print(f"WARNING: Could not cache {url}: {e}")
+
+
+async def cached_html(cache, session, url, options):
+    """
+    Return the HTML of a cached snapshot of the page so it can be extracted
+    without loading it, and the URL it was served from. Stale entries are
+    revalidated with a conditional request first; a static page that changed
+    is re-cached straight from the revalidation response. Returns None when
+    the page has to be loaded again.
+    """
+    entry = await asyncio.to_thread(cache.load, url, options)
+    if entry is None:
+        return None
+
+    if not cache.is_fresh(entry):
+        try:
+            response = await asyncio.to_thread(cache.revalidate, session, entry)
+        except Exception:
+            return None
+        if response is None:
+            return None
+        if response.status_code == 304:
+            try:
+                await asyncio.to_thread(cache.refresh, entry)
+            except Exception as e:
+                print(f"WARNING: Could not cache {url}: {e}")
+        elif response.ok and options.engine == "static":
+            await cache_page(
+                cache, url, options, response.text, response.headers, response.url
+            )
+            entry["html"] = response.text
+            entry["final_url"] = response.url
+        else:
+            return None
+
+    return entry["html"], entry.get("final_url") or url
+
+
+async def scrape_url(pool, url, selectors, options, session=None, cache=None, verbose=False):
+    """
+    Scrape one URL, prompting for alternative selectors only when the options
+    allow it. Pages found in the cache are extracted without any network
+    round-trip; the static engine fetches the raw HTML over the shared session;
+    the auto engine only renders the page in the browser pool when a selector
+    comes back empty from the static pass.
+    Returns a result dictionary with the url, its data, an error message, the
+    links to follow when crawling and the page's timings and counters.
+    """
+    metrics = PageMetrics()
+    results = await _scrape_url(
+        pool, url, [(selectors, options)], options, session, cache, verbose, [metrics]
+    )
+    results[0]["metrics"] = metrics.to_dict()
+    return results[0]
+
+
+async def scrape_page(pool, url, extractions, options, session=None, cache=None):
+    """
+    Load a page once and run several extractions on it, each a (selectors,
+    options) pair whose options share the page's render settings (see
+    coalesce.render_key). Returns one result per extraction, in order, like
+    scrape_url. The page load is timed in the first result; the others only
+    carry their own extraction and count as coalesced.
+    """
+    metrics = [PageMetrics() for _ in extractions]
+    results = await _scrape_url(pool, url, extractions, options, session, cache, False, metrics)
+    for index, (result, page_metrics) in enumerate(zip(results, metrics)):
+        if index:
+            page_metrics.count("coalesced")
+        result["metrics"] = page_metrics.to_dict()
+    return results
+
+
+async def _scrape_url(pool, url, extractions, options, session, cache, verbose, metrics):
+    """
+    Load a page and run every (selectors, options) extraction on it.
+    metrics holds one PageMetrics per extraction; the page load is recorded
+    in the first.
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    def failed(error):
+        return [{"url": url, "data": None, "error": error} for _ in extractions]
+
+    def extracted(pages):
+        results = []
+        for (columns, links), page_metrics in zip(pages, metrics):
+            page_metrics.count_elements(
+                columns, [s for s, values in columns.items() if not values]
+            )
+            if verbose:
+                report_missing(columns)
+            results.append(
+                {"url": url, "data": mark_missing(columns), "error": None, "links": links}
+            )
+        return results
+
+    async def parse_all(html, page_url):
+        with metrics[0].phase("parse"):
+            soup = await asyncio.to_thread(parse_html, html)
+        pages = []
+        for (selectors, spec_options), page_metrics in zip(extractions, metrics):
+            with page_metrics.phase("parse"):
+                pages.append(
+                    await asyncio.to_thread(parse_page, soup, selectors, spec_options, page_url)
+                )
+        return pages
+
+    page_metrics = metrics[0]
+    engine = options.engine
+    if engine == "auto" and (options.scroll or har_mode(options)):
+        # Items loaded on scroll never show up in the static HTML, and HAR
+        # archives are recorded and replayed by the browser
+        engine = "browser"
+
+    if cache is not None:
+        with page_metrics.phase("cache"):
+            cached = await cached_html(cache, session, url, options)
+        if cached is not None:
+            page_metrics.count("cache_hits")
+            if verbose:
+                print("SUCCESS: Page served from cache!")
+            return extracted(await parse_all(*cached))
+
+    if engine != "browser":
+        if verbose:
+            print("Fetching page without a browser...")
+        try:
+            with page_metrics.phase("fetch"):
+                response = await pool.fetch(session, url)
+            page_metrics.count("bytes", len(response.content))
+            # Relative links resolve against the URL after redirects
+            pages = await parse_all(response.text, response.url)
+        except Exception as e:
+            if engine == "static":
+                return failed(str(e))
+            if verbose:
+                print(f"WARNING: Could not fetch page without a browser ({e})")
+            pages = None
+
+        if pages is not None and (
+            engine == "static" or all(all(columns.values()) for columns, _ in pages)
+        ):
+            if verbose:
+                print("SUCCESS: Page fetched successfully!")
+            if cache is not None:
+                await cache_page(
+                    cache, url, options, response.text, response.headers, response.url
+                )
+            return extracted(pages)
+
+        if verbose:
+            print("Falling back to the browser...")
+
+    if verbose and pool.browser is None:
+        if pool.endpoint:
+            print(f"Attaching to browser daemon at {pool.endpoint}...")
+        else:
+            print("Launching browser...")
+    with page_metrics.phase("launch"):
+        await pool.start()
+
+    acquired = time.perf_counter()
+    async with pool.page(options, url) as page:
+        page_metrics.record("context", time.perf_counter() - acquired)
+        page.on("response", count_response_bytes(page_metrics))
+        try:
+            if verbose:
+                print("Loading page...")
+            with page_metrics.phase("navigation"):
+                response = await page.goto(
+                    url, timeout=PAGE_TIMEOUT, wait_until=options.wait_until
+                )
+            if response is not None and (response.status == 429 or response.status >= 500):
+                # An overloaded server: report it so the page can be retried
+                return failed(f"HTTP {response.status}")
+            if verbose:
+                print("SUCCESS: Page loaded successfully!")
+
+            results = []
+            for (selectors, spec_options), spec_metrics in zip(extractions, metrics):
+                data = await extract_selectors(
+                    page, selectors, spec_options, verbose, spec_metrics
+                )
+                links = None
+                if getattr(spec_options, "follow", None):
+                    with spec_metrics.phase("extract"):
+                        links = await extract_links(page, spec_options.follow)
+                results.append({"url": url, "data": data, "error": None, "links": links})
+            if cache is not None:
+                await cache_page(
+                    cache,
+                    url,
+                    options,
+                    await page.content(),
+                    response.headers if response else {},
+                    page.url,
+                )
+            return results
+        except PlaywrightTimeoutError:
+            return failed("Timeout while loading page")
+        except Exception as e:
+            return failed(str(e))
+
+
+def har_mode(options):
+    return getattr(options, "record_har", None) or getattr(options, "replay_har", None)
+
+
+def needs_session(options):
+    return options.engine != "browser" or getattr(options, "cache", False)
+
+
+def create_pool(options, size):
+    """
+    Create a browser pool, attached to the browser daemon when one is running
+    """
+    if options.engine == "static" or not getattr(options, "daemon", True):
+        endpoint = None
+    else:
+        endpoint = find_browser_daemon()
+    return BrowserPool(size=size, endpoint=endpoint)
+
+
+async def scrape_single(url, selectors, options, run_metrics=None):
+    """
+    Scrape one URL interactively, reporting progress for every step.
+    Returns the scraped data, or None if the page could not be loaded.
+    """
+    session = create_session(pool_size=1) if needs_session(options) else None
+    try:
+        async with create_pool(options, size=1) as pool:
+            result = await scrape_url(
+                pool, url, selectors, options, session, open_cache(options), verbose=True
+            )
+    finally:
+        if session is not None:
+            session.close()
+
+    if run_metrics is not None:
+        run_metrics.add_page(result)
+
+    if result["error"]:
+        print(f"ERROR: Failed to scrape URL: {url}")
+        print(f"Error details: {result['error']}")
+        return None
+    return result["data"]
+
+
+async def scrape_urls(urls, selectors, options, pool=None, session=None):
+    """
+    Scrape every URL with a bounded number of concurrent pages, sharing one
+    browser and one HTTP session between them. URLs may be a list, any other
+    iterable (read in a worker thread, see ThreadedUrls) or an async iterator
+    that several workers can wait on at once (a crawl frontier), and are
+    consumed lazily; results are yielded as soon as each page completes.
+    Pages are never prompted for alternative selectors. Transient failures
+    are retried, and per-host rate limits and adaptive concurrency apply when
+    the options enable them.
+    A pool and session passed in are shared with other runs and left open.
+    """
+    concurrency = options.concurrency
+    options = copy.copy(options)
+    options.prompt = False
+    if not isinstance(urls, (list, tuple)) and not hasattr(urls, "__anext__"):
+        urls = ThreadedUrls(urls)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+    own_session = session is None and needs_session(options)
+    if own_session:
+        session = create_session(pool_size=concurrency)
+    own_pool = pool is None
+    if own_pool:
+        pool = create_pool(options, size=concurrency)
+    cache = open_cache(options)
+    throttle = Throttle(options)
+
+    url_iter = iter(urls) if isinstance(urls, (list, tuple)) else urls
+
+    async def next_url():
+        if isinstance(urls, (list, tuple)):
+            return next(url_iter, None)
+        try:
+            return await url_iter.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def worker():
+        try:
+            while (url := await next_url()) is not None:
+                scrape = functools.partial(
+                    scrape_url, pool, url, selectors, options, session, cache
+                )
+                await results.put(await throttle.run(url, scrape))
+        except Exception as e:
+            # Surface failures of the URL source to the consumer
+            await results.put(e)
+            return
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < len(workers):
+            result = await results.get()
+            if result is None:
+                finished += 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                yield result
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if own_pool:
+            await pool.close()
+        if own_session:
+            session.close()
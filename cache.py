@@ -0,0 +1,197 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+from static import FETCH_TIMEOUT
+
+DEFAULT_CACHE_DIR = ".scraplet_cache"
+DEFAULT_CACHE_TTL = 3600
+DEFAULT_CACHE_SIZE_MB = 500
+
+# Options that change what a loaded page looks like. Selectors are left out on
+# purpose so tuning them keeps hitting the same cache entry.
+# The storage state is included since logged-in pages differ from anonymous ones.
+RENDER_KEY_OPTIONS = ["engine", "wait_until", "block", "block_urls", "scroll", "storage_state"]
+
+
+class PageCache:
+    """
+    On-disk cache of page snapshots keyed by URL and render options.
+    Every entry is a gzipped JSON file holding the HTML (the rendered DOM for
+    browser pages), the response headers and the time it was stored.
+    Entries older than ttl seconds are revalidated with their ETag or
+    Last-Modified header, or dropped when they have neither; the least recently
+    used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(
+        self,
+        directory=DEFAULT_CACHE_DIR,
+        ttl=DEFAULT_CACHE_TTL,
+        max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, url, options):
+        """
+        Cache key for a URL rendered with the given options
+        """
+        render = {name: getattr(options, name, None) for name in RENDER_KEY_OPTIONS}
+        payload = json.dumps({"url": url, "render": render}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def load(self, url, options):
+        """
+        Return the cached entry for a URL, or None when there is no usable entry.
+        Stale entries without validators are removed.
+        """
+        path = self._path(self.key(url, options))
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Corrupt or partially written entry
+            self._remove(path)
+            return None
+
+        if not self.is_fresh(entry) and not (entry.get("etag") or entry.get("last_modified")):
+            self._remove(path)
+            return None
+
+        # Mark the entry as recently used for size eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        entry["key"] = self.key(url, options)
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def store(self, url, options, html, headers, final_url=None):
+        """
+        Store a page snapshot along with its validators and the URL it was
+        served from after redirects
+        """
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        entry = {
+            "url": url,
+            "final_url": final_url or url,
+            "stored_at": time.time(),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "headers": headers,
+            "html": html,
+        }
+        self._write(self.key(url, options), entry)
+
+    def refresh(self, entry):
+        """
+        Restart the TTL of an entry the server confirmed is unchanged
+        """
+        key = entry.pop("key")
+        entry["stored_at"] = time.time()
+        self._write(key, entry)
+
+    def revalidate(self, session, entry):
+        """
+        Send a conditional GET for a stale entry.
+        Returns the response (304 when the cached page is still current), or
+        None when the entry has no validators.
+        """
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if not headers:
+            return None
+        return session.get(entry["url"], headers=headers, timeout=FETCH_TIMEOUT)
+
+    def _write(self, key, entry):
+        path = self._path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+                json.dump(entry, f)
+        except BaseException:
+            self._remove(temp_path)
+            raise
+
+        with self._lock:
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)
+            if self._size is None:
+                self._size = self._directory_size()
+            else:
+                self._size += os.path.getsize(path) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """
+        (path, stat) of every cache entry. Files still being written, or
+        removed meanwhile, are left out.
+        """
+        entries = []
+        for item in os.scandir(self.directory):
+            if not item.name.endswith(".json.gz"):
+                continue
+            try:
+                entries.append((item.path, item.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def _directory_size(self):
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def _evict(self):
+        """
+        Remove least recently used entries until the cache is 10% below its limit
+        """
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        target = self.max_bytes * 0.9
+        for path, stat in entries:
+            if size <= target:
+                break
+            size -= stat.st_size
+            self._remove(path)
+        self._size = size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def open_cache(options):
+    """
+    Open the page cache described by the options, or None when caching is off
+    """
+    if not getattr(options, "cache", False):
+        return None
+    return PageCache(
+        options.cache_dir,
+        ttl=options.cache_ttl,
+        max_bytes=options.cache_size * 1024 * 1024,
+    )
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import sqlite3
+from collections import Counter
+
+from extract import NOT_FOUND
+from writers import columns_to_rows
+
+DEFAULT_INDEX_FILE = "scraplet_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    url TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    item TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    key TEXT,
+    PRIMARY KEY (url, columns, item)
+)
+"""
+
+
+def content_hash(value):
+    return hashlib.blake2b(str(value).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class ChangeIndex:
+    """
+    Persisted content hashes of every scraped item, keyed by URL, the set of
+    columns scraped and the item's identity: the value of the key column when
+    one is given, otherwise the item's content. Comparing a page against the
+    index yields only the rows that were added, modified or removed since the
+    page was last scraped, wherever the items moved on the page.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_FILE, key=None):
+        self.path = path
+        self.key = key
+        self.db = sqlite3.connect(path)
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(items)")]
+        if columns and "columns" not in columns:
+            # Indexes from before items had an identity are rebuilt
+            print("WARNING: Rebuilding the change index; every item is reported as added once")
+            self.db.execute("DROP TABLE items")
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def identify(self, rows):
+        """
+        Yield (item id, content hash, key value, row) for every row holding
+        anything. Columns with the not-found marker are left out, and
+        identical items on a page are told apart by their order.
+        """
+        seen = Counter()
+        for row in rows:
+            values = {column: value for column, value in row.items() if value != NOT_FOUND}
+            if not values:
+                continue
+            digest = content_hash(json.dumps(values, sort_keys=True, ensure_ascii=False))
+            key = values.get(self.key) if self.key else None
+            identity = content_hash(key)[:16] if key is not None else digest[:16]
+            seen[identity] += 1
+            if seen[identity] > 1:
+                identity = f"{identity}-{seen[identity] - 1}"
+            yield identity, digest, key, row
+
+    def diff(self, url, data):
+        """
+        Compare the columns scraped from a page with the index and store the new
+        hashes. Returns one row per changed item, tagged with the kind of change
+        and the item's id. Removed rows only carry their id and key column,
+        since the index keeps hashes rather than values.
+        """
+        columns = content_hash(json.dumps(list(data)))
+        previous = {
+            item: (digest, key)
+            for item, digest, key in self.db.execute(
+                "SELECT item, hash, key FROM items WHERE url = ? AND columns = ?",
+                (url, columns),
+            )
+        }
+
+        changes = []
+        current = []
+        for item, digest, key, row in self.identify(columns_to_rows(data)):
+            current.append((url, columns, item, digest, key))
+            if item not in previous:
+                change = "added"
+            elif previous.pop(item)[0] != digest:
+                change = "modified"
+            else:
+                continue
+            changes.append({"url": url, "change": change, "item": item, **row})
+
+        for item, (_, key) in previous.items():
+            removed = {"url": url, "change": "removed", "item": item}
+            if key is not None:
+                removed[self.key] = key
+            changes.append(removed)
+
+        with self.db:
+            self.db.execute("DELETE FROM items WHERE url = ? AND columns = ?", (url, columns))
+            self.db.executemany("INSERT INTO items VALUES (?, ?, ?, ?, ?)", current)
+        return changes
+
+
+def open_change_index(options):
+    """
+    Open the change index described by the options, or None when every run
+    exports the full dataset
+    """
+    if not getattr(options, "changes_only", False):
+        return None
+    return ChangeIndex(options.index_file, getattr(options, "change_key", None))
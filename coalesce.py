@@ -0,0 +1,166 @@
+import asyncio
+import json
+from itertools import islice
+
+from crawl import normalize_url
+
+# Options that decide how a page is loaded and retried. Runs whose options
+# agree on all of them can share one page load; selectors, record mode and
+# selector waits are applied per run on the loaded page.
+SHARED_OPTIONS = [
+    "engine",
+    "wait_until",
+    "block",
+    "block_urls",
+    "storage_state",
+    "reuse_context",
+    "record_har",
+    "replay_har",
+    "cache",
+    "cache_dir",
+    "cache_ttl",
+    "adaptive",
+    "rate_limit",
+    "retries",
+]
+# Pages held back while the URLs of the runs are read, so runs listing the
+# same URL close together share its page load
+COALESCE_WINDOW = 1000
+# URLs read from one run at a time
+PLAN_CHUNK = 64
+
+
+def render_key(options):
+    """
+    Key of the render options of a run, or None when its pages cannot be
+    shared: scrolling changes the page while it is extracted
+    """
+    if getattr(options, "scroll", False):
+        return None
+    return json.dumps(
+        {name: getattr(options, name, None) for name in SHARED_OPTIONS}, sort_keys=True
+    )
+
+
+async def plan_pages(runs, failed, window=COALESCE_WINDOW):
+    """
+    Group the URLs of several runs, each a (urls, selectors, options) tuple,
+    into the pages to load, yielded as (url, options, extractions) where
+    extractions lists a (run index, url, selectors, options) tuple for every
+    run and listing of the page. URLs are read from the runs in turn, a chunk
+    at a time off the event loop, and up to `window` pages wait before the oldest is yielded,
+    so runs listing a URL within that window share its page and long lists
+    are never held in memory. A run whose URL source fails is dropped and
+    reported with `await failed(run index, error)`.
+    """
+    sources = {index: iter(urls) for index, (urls, _, _) in enumerate(runs)}
+    pages = {}
+    while sources:
+        for index in list(sources):
+            try:
+                urls = await asyncio.to_thread(list, islice(sources[index], PLAN_CHUNK))
+            except Exception as e:
+                del sources[index]
+                await failed(index, e)
+                continue
+            if not urls:
+                del sources[index]
+                continue
+
+            _, selectors, options = runs[index]
+            key = render_key(options)
+            for url in urls:
+                page_key = (normalize_url(url), index if key is None else key)
+                if page_key not in pages:
+                    if len(pages) >= window:
+                        yield pages.pop(next(iter(pages)))
+                    pages[page_key] = (url, options, [])
+                pages[page_key][2].append((index, url, selectors, options))
+    for page in pages.values():
+        yield page
+
+
+async def coalesced_results(runs, pool, session, concurrency):
+    """
+    Load every page planned for the runs once, with up to `concurrency` pages
+    at a time, run the selectors of every run that listed it on the loaded
+    page and yield (run index, result) pairs as pages complete. Results carry
+    each run's own URL. A run whose URL source fails gets the exception as
+    its last result; the other runs carry on.
+    """
+    from browser import scrape_page
+    from cache import open_cache
+    from throttle import Throttle
+
+    planned = asyncio.Queue(maxsize=concurrency)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+    caches = {}
+    throttles = {}
+
+    def page_cache(options):
+        key = render_key(options)
+        if key not in caches:
+            caches[key] = open_cache(options)
+        return caches[key]
+
+    def page_throttle(options):
+        # Retries, rate limits and adaptive concurrency follow the page's own options
+        key = render_key(options)
+        if key not in throttles:
+            throttles[key] = Throttle(options)
+        return throttles[key]
+
+    async def load(url, options, extractions):
+        specs = [(selectors, run_options) for _, _, selectors, run_options in extractions]
+
+        async def scrape():
+            page_results = await scrape_page(
+                pool, url, specs, options, session, page_cache(options)
+            )
+            # Throttle.run judges the page by the first result, and counts
+            # retries in its metrics
+            return {**page_results[0], "pages": page_results}
+
+        loaded = await page_throttle(options).run(url, scrape)
+        for (index, run_url, _, _), result in zip(extractions, loaded["pages"]):
+            result["url"] = run_url
+            await results.put((index, result))
+
+    async def failed(index, error):
+        await results.put((index, error))
+
+    async def planner():
+        try:
+            async for page in plan_pages(runs, failed):
+                await planned.put(page)
+        except Exception as e:
+            await results.put(e)
+        finally:
+            for _ in range(concurrency):
+                await planned.put(None)
+
+    async def worker():
+        try:
+            while (page := await planned.get()) is not None:
+                await load(*page)
+        except Exception as e:
+            await results.put(e)
+            return
+        await results.put(None)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    tasks.append(asyncio.create_task(planner()))
+    try:
+        finished = 0
+        while finished < concurrency:
+            item = await results.get()
+            if item is None:
+                finished += 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,251 @@
+import asyncio
+import hashlib
+import os
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_MAX_PAGES = 1000
+DEFAULT_PORTS = {"http": ":80", "https": ":443"}
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for deduplication: lower-case scheme and host,
+    no default port, no fragment and "/" for an empty path
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if netloc.endswith(DEFAULT_PORTS.get(scheme, "\0")):
+        netloc = netloc.rsplit(":", 1)[0]
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def url_key(url):
+    """
+    64-bit hash of the normalized URL
+    """
+    digest = hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def journal_path(filename):
+    return f"{filename}.frontier"
+
+
+class Frontier:
+    """
+    URLs waiting to be crawled, handed to scrape workers as an async iterator
+    that any number of them can wait on. Every URL ever queued is remembered
+    as a 64-bit hash of its normalized form, so the seen set costs a few dozen
+    bytes per URL whatever the URL's length. Links are only queued up to
+    max_depth hops from the start URLs and, unless hosts is None, on the start
+    URLs' hosts. Iteration ends once nothing is queued or in flight, or once
+    max_pages pages were started.
+    With a journal, every queued URL and every page finished without error is
+    appended to it, so an interrupted crawl can be loaded back with load().
+    """
+
+    def __init__(self, max_depth=None, max_pages=DEFAULT_MAX_PAGES, hosts=None, journal=None):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.hosts = hosts
+        self.journal = journal
+        self.queue = deque()
+        self.seen = set()
+        self.in_flight = {}
+        self.started = 0
+        self._wakeup = asyncio.Event()
+
+    @classmethod
+    def load(cls, path, **settings):
+        """
+        Rebuild a frontier from its journal: URLs finished earlier count
+        towards max_pages and everything else queued is crawled again.
+        Malformed lines, such as the half-written last line of a crawl that
+        crashed, are skipped.
+        """
+        frontier = cls(**settings)
+        queued = {}
+        finished = set()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    continue
+                kind, _, rest = line[:-1].partition(" ")
+                if kind == "+":
+                    depth, _, url = rest.partition(" ")
+                    try:
+                        depth = int(depth)
+                    except ValueError:
+                        continue
+                    if url:
+                        queued.setdefault(url, depth)
+                elif kind == "-" and rest:
+                    finished.add(rest)
+        for url, depth in queued.items():
+            frontier.seen.add(url_key(url))
+            if url in finished:
+                frontier.started += 1
+            else:
+                frontier.queue.append((url, depth))
+        return frontier
+
+    def add(self, url, depth):
+        """
+        Queue a URL unless it was seen before or falls outside the limits.
+        Returns True when it was queued.
+        """
+        if self.max_depth is not None and depth > self.max_depth:
+            return False
+        if self.hosts is not None and urlsplit(url).netloc.lower() not in self.hosts:
+            return False
+        key = url_key(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        self.queue.append((url, depth))
+        if self.journal is not None:
+            self.journal.write(f"+ {depth} {url}\n")
+        return True
+
+    def done(self, url, links=None, ok=True):
+        """
+        Finish a page, queueing the links found on it one hop deeper.
+        Returns the number of links queued.
+        """
+        depth = self.in_flight.pop(url)
+        added = sum(self.add(link, depth + 1) for link in links or [])
+        if self.journal is not None:
+            # Links are journaled before their page, so a crash in between
+            # re-crawls the page rather than losing its links
+            if ok:
+                self.journal.write(f"- {url}\n")
+            self.journal.flush()
+        self._wakeup.set()
+        return added
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            if self.max_pages is not None and self.started >= self.max_pages:
+                raise StopAsyncIteration
+            if self.queue:
+                url, depth = self.queue.popleft()
+                self.in_flight[url] = depth
+                self.started += 1
+                return url
+            if not self.in_flight:
+                raise StopAsyncIteration
+            # Wait for a page in flight to finish and maybe queue more links
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+
+async def crawl_results(frontier, selectors, options, pool=None, session=None, metrics=None):
+    """
+    Scrape the frontier's URLs concurrently and yield their results, feeding
+    the links found on every page back into the frontier once the result has
+    been consumed
+    """
+    from browser import scrape_urls
+
+    async for result in scrape_urls(frontier, selectors, options, pool=pool, session=session):
+        yield result
+        added = frontier.done(result["url"], result.get("links"), ok=not result["error"])
+        if metrics is not None:
+            metrics.counters["links_queued"] += added
+
+
+def trim_journal(path):
+    """
+    Cut off a half-written last line of a journal, so lines appended on
+    resume start on a line of their own and the fragment is never read back
+    """
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            f.seek(max(end - 4096, 0))
+            chunk = f.read(end - max(end - 4096, 0))
+            if b"\n" in chunk:
+                f.truncate(end - len(chunk) + chunk.rindex(b"\n") + 1)
+                return
+            end -= len(chunk)
+        f.truncate(0)
+
+
+def open_frontier(options, seeds, journal=None):
+    """
+    A frontier holding the start URLs, limited by the options
+    """
+    hosts = None if options.any_host else {urlsplit(url).netloc.lower() for url in seeds}
+    frontier = Frontier(options.max_depth, options.max_pages, hosts, journal)
+    for url in seeds:
+        frontier.add(url, 0)
+    return frontier
+
+
+def run_crawl(args, selectors, run_metrics):
+    """
+    Crawl from the URL or batch of start URLs, following args.follow links.
+    For CSV and JSON Lines output the frontier is journaled next to the output
+    file, so an interrupted crawl, or one that hit --max-pages, continues with
+    --resume without refetching exported pages. Returns True when the
+    frontier was exhausted.
+    """
+    from changes import open_change_index
+    from sources import read_url_list
+    from writers import WRITERS, output_filename, write_results
+
+    seeds = [args.url] if args.url else list(read_url_list(args.batch, args))
+    appendable = args.output in WRITERS and WRITERS[args.output].appendable
+    path = journal_path(output_filename(args.output, args.output_file)) if appendable else None
+    resuming = args.resume and path is not None and os.path.exists(path)
+
+    if resuming:
+        trim_journal(path)
+    journal = open(path, "a" if resuming else "w", encoding="utf-8") if path else None
+    if resuming:
+        hosts = None if args.any_host else {urlsplit(url).netloc.lower() for url in seeds}
+        frontier = Frontier.load(
+            path, max_depth=args.max_depth, max_pages=args.max_pages, hosts=hosts
+        )
+        frontier.journal = journal
+        print(
+            f"Resuming crawl: {frontier.started} page(s) already exported, "
+            f"{len(frontier.queue)} queued"
+        )
+    else:
+        frontier = open_frontier(args, seeds, journal)
+
+    changes = open_change_index(args)
+    try:
+        asyncio.run(
+            write_results(
+                crawl_results(frontier, selectors, args, metrics=run_metrics),
+                selectors,
+                args.output,
+                run_metrics,
+                args.output_file,
+                changes=changes,
+                append=resuming,
+                compression=args.compression,
+            )
+        )
+    finally:
+        if changes is not None:
+            changes.close()
+        if journal is not None:
+            journal.close()
+
+    print(f"Crawled {frontier.started} page(s), {len(frontier.seen)} unique URL(s) found")
+    if frontier.queue:
+        print(f"WARNING: Stopped at --max-pages with {len(frontier.queue)} URL(s) still queued")
+        if path:
+            print("Run the same command with --resume and a higher --max-pages to continue.")
+        return False
+    if path:
+        os.remove(path)
+    return True
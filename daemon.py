@@ -0,0 +1,89 @@
+import asyncio
+import json
+import os
+import signal
+
+DEFAULT_DAEMON_PORT = 9333
+STATE_FILE = os.path.join(os.path.expanduser("~"), ".scraplet", "browser.json")
+CONNECT_CHECK_TIMEOUT = 0.5
+
+
+def find_browser_daemon():
+    """
+    Return the endpoint of a running browser daemon, or None if there is none.
+    A state file left behind by a daemon that was killed is ignored.
+    """
+    import urllib.request
+
+    try:
+        with open(STATE_FILE, "r") as f:
+            endpoint = json.load(f)["endpoint"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    try:
+        with urllib.request.urlopen(
+            f"{endpoint}/json/version", timeout=CONNECT_CHECK_TIMEOUT
+        ):
+            return endpoint
+    except Exception:
+        return None
+
+
+def write_state(endpoint):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    with open(STATE_FILE, "w") as f:
+        json.dump({"endpoint": endpoint, "pid": os.getpid()}, f)
+
+
+def remove_state():
+    try:
+        os.remove(STATE_FILE)
+    except FileNotFoundError:
+        pass
+
+
+async def serve_browser(port=DEFAULT_DAEMON_PORT, headless=True):
+    """
+    Keep one Chromium instance running with its DevTools endpoint on
+    127.0.0.1:port until interrupted. Scraplet runs attach to it instead of
+    launching their own browser.
+    """
+    if find_browser_daemon():
+        print("ERROR: A browser daemon is already running")
+        return
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still ends the daemon through KeyboardInterrupt
+            pass
+
+    from playwright.async_api import async_playwright
+
+    print("Launching browser...")
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(
+            headless=headless,
+            args=[
+                f"--remote-debugging-port={port}",
+                "--remote-debugging-address=127.0.0.1",
+            ],
+        )
+        browser.on("disconnected", lambda _: stop.set())
+
+        endpoint = f"http://127.0.0.1:{port}"
+        write_state(endpoint)
+        print(f"SUCCESS: Browser daemon listening on {endpoint}")
+        print("Scraplet runs will attach to it automatically. Press Ctrl+C to stop.")
+
+        try:
+            await stop.wait()
+        finally:
+            remove_state()
+            if browser.is_connected():
+                await browser.close()
+            print("Browser daemon stopped.")
@@ -0,0 +1,286 @@
+import re
+
+# Placeholder stored for selectors that matched nothing on the page
+NOT_FOUND = "ERROR: Selector not found"
+SELECTOR_SEPARATOR = "||"
+
+
+# Attributes holding links, returned as absolute URLs in record mode
+URL_ATTRIBUTES = ["href", "src"]
+
+FIELD_NAME = re.compile(r"[A-Za-z_][\w-]*")
+FIELD_ATTRIBUTE = re.compile(r"(.*)@([\w:-]+)")
+
+
+def get_selectors(selector):
+    separator = SELECTOR_SEPARATOR
+    if separator in selector:
+        selectors = selector.split(separator)
+    else:
+        selectors = [selector]
+    return selectors
+
+
+def get_fields(selector):
+    """
+    Parse the fields of record mode from a selector string such as
+    "title=h2||link=a@href||id=@data-id". Each field is name=selector, with an
+    optional @attribute to read instead of the text; an empty selector means
+    the record element itself. Fields without a name are named after their
+    selector. Raises ValueError for duplicate names.
+    """
+    fields = []
+    for part in get_selectors(selector):
+        part = part.strip()
+        name, separator, rest = part.partition("=")
+        if not separator or not FIELD_NAME.fullmatch(name.strip()):
+            name, rest = part, part
+
+        attribute = None
+        match = FIELD_ATTRIBUTE.fullmatch(rest.strip())
+        if match:
+            rest, attribute = match.groups()
+
+        fields.append(
+            {"name": name.strip(), "selector": rest.strip(), "attribute": attribute}
+        )
+
+    names = [field["name"] for field in fields]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate field name(s): {', '.join(duplicates)}")
+    return fields
+
+
+def get_columns(selector, record=None):
+    """
+    Column names for a selector string, and the parsed fields in record mode
+    (None otherwise). Raises ValueError for invalid record fields.
+    """
+    if not record:
+        return get_selectors(selector), None
+    fields = get_fields(selector)
+    return [field["name"] for field in fields], fields
+
+
+# Scripts evaluated inside the page. Each one does all of its work in a single
+# call so extraction costs one round-trip no matter how many elements match.
+
+# Returns {selector: [text, ...]} for every selector. Selectors the browser's
+# own querySelectorAll cannot parse (e.g. Playwright "text=" or "xpath="
+# engines) map to null so the caller can fall back to Playwright's engine.
+EXTRACT_SCRIPT = """
+(selectors) => {
+    const columns = {};
+    for (const selector of selectors) {
+        try {
+            columns[selector] = Array.from(
+                document.querySelectorAll(selector),
+                (element) => element.innerText ?? element.textContent ?? ""
+            );
+        } catch (error) {
+            columns[selector] = null;
+        }
+    }
+    return columns;
+}
+"""
+
+# Returns true once at least `needed` of the selectors match an element, so a
+# single wait_for_function call covers every selector under one deadline.
+# Selectors querySelector cannot parse are counted as present and left to
+# Playwright's own engine during extraction.
+WAIT_SCRIPT = """
+({ selectors, needed }) => {
+    let found = 0;
+    for (const selector of selectors) {
+        try {
+            if (document.querySelector(selector)) {
+                found++;
+            }
+        } catch (error) {
+            found++;
+        }
+    }
+    return found >= needed;
+}
+"""
+
+# Builds the row of one record element, with a value for every field, so
+# fields missing from a record come back as empty strings in the same row
+# instead of shifting later rows.
+RECORD_ROW = """
+(record, fields, urlAttributes) => {
+    const row = {};
+    for (const field of fields) {
+        let element = record;
+        if (field.selector) {
+            try {
+                element = record.querySelector(field.selector);
+            } catch (error) {
+                element = null;
+            }
+        }
+
+        let value = "";
+        if (element && field.attribute) {
+            value = element.getAttribute(field.attribute) ?? "";
+            if (value && urlAttributes.includes(field.attribute)) {
+                try {
+                    value = new URL(value, document.baseURI).href;
+                } catch (error) {}
+            }
+        } else if (element) {
+            value = element.innerText ?? element.textContent ?? "";
+        }
+        row[field.name] = value;
+    }
+    return row;
+}
+"""
+
+# Evaluated with the record container's matches. Returns one row per record.
+RECORD_SCRIPT = (
+    """
+(records, { fields, urlAttributes }) => {
+    const recordRow = """
+    + RECORD_ROW
+    + """;
+    return records.map((record) => recordRow(record, fields, urlAttributes));
+}
+"""
+)
+
+# Scrolls the page and collects matches as the feed loads them. A
+# MutationObserver wakes the loop as soon as new nodes arrive, so fast pages
+# are not slowed down by fixed sleeps; harvesting stops once no new match has
+# appeared for `idle` ms, after `timeout` ms, or when `maxItems` are found
+# (0 for no limit).
+# Elements are kept as they are discovered, so feeds that remove scrolled-past
+# items still return them. Returns the same columns as EXTRACT_SCRIPT (or one
+# row per record in record mode) plus the number of scroll steps.
+SCROLL_SCRIPT = (
+    """
+async ({ selectors, record, fields, urlAttributes, maxItems, timeout, idle }) => {
+    const recordRow = """
+    + RECORD_ROW
+    + """;
+    const targets = record ? [record] : selectors;
+    const seen = targets.map(() => new Set());
+    const found = targets.map(() => []);
+    const invalid = new Set();
+
+    const scan = () => {
+        let added = 0;
+        targets.forEach((selector, index) => {
+            if (invalid.has(selector)) {
+                return;
+            }
+            let matches;
+            try {
+                matches = document.querySelectorAll(selector);
+            } catch (error) {
+                invalid.add(selector);
+                return;
+            }
+            for (const element of matches) {
+                if (!seen[index].has(element)) {
+                    seen[index].add(element);
+                    found[index].push(element);
+                    added++;
+                }
+            }
+        });
+        return added;
+    };
+    const count = () => Math.max(0, ...found.map((elements) => elements.length));
+
+    const limit = maxItems || Infinity;
+    let dirty = false;
+    let wake = null;
+    const observer = new MutationObserver(() => {
+        dirty = true;
+        if (wake) {
+            wake();
+        }
+    });
+    observer.observe(document.documentElement, { childList: true, subtree: true });
+
+    const start = performance.now();
+    let lastNew = start;
+    let steps = 0;
+    scan();
+    try {
+        while (count() < limit) {
+            const now = performance.now();
+            const remaining = start + timeout - now;
+            if (remaining <= 0 || now - lastNew >= idle) {
+                break;
+            }
+
+            const scroller = document.scrollingElement || document.documentElement;
+            window.scrollTo(0, scroller.scrollHeight);
+            const last = found[0][found[0].length - 1];
+            if (last && last.isConnected) {
+                // Also reaches feeds that scroll inside their own container
+                last.scrollIntoView({ block: "end" });
+            }
+            steps++;
+
+            if (!dirty) {
+                await new Promise((resolve) => {
+                    wake = resolve;
+                    setTimeout(resolve, Math.min(idle - (now - lastNew), remaining));
+                });
+                wake = null;
+            }
+            dirty = false;
+            // Let the rest of the batch of mutations land before scanning
+            await new Promise((resolve) => setTimeout(resolve, 50));
+            if (scan() > 0) {
+                lastNew = performance.now();
+            }
+        }
+    } finally {
+        observer.disconnect();
+    }
+
+    const text = (element) => element.innerText ?? element.textContent ?? "";
+    if (record) {
+        return {
+            rows: found[0].slice(0, limit).map((element) => recordRow(element, fields, urlAttributes)),
+            steps,
+        };
+    }
+    const columns = {};
+    selectors.forEach((selector, index) => {
+        columns[selector] = invalid.has(selector) ? null : found[index].slice(0, limit).map(text);
+    });
+    return { columns, steps };
+}
+"""
+)
+
+# Returns the absolute http(s) URL of the href of every element passed in,
+# without fragments, for eval_on_selector_all.
+LINKS_SCRIPT = """
+(elements) => {
+    const links = [];
+    for (const element of elements) {
+        const href = element.getAttribute("href");
+        if (!href) {
+            continue;
+        }
+        try {
+            const url = new URL(href.trim(), document.baseURI);
+            url.hash = "";
+            if (url.protocol === "http:" || url.protocol === "https:") {
+                links.push(url.href);
+            }
+        } catch (error) {
+            // Not a valid URL
+        }
+    }
+    return links;
+}
+"""
@@ -0,0 +1,502 @@
+import asyncio
+import copy
+import json
+import os
+import re
+import sqlite3
+import time
+
+DEFAULT_JOB_DB = "scraplet_jobs.db"
+DEFAULT_POOL_SIZE = 8
+POLL_INTERVAL = 30
+
+# Scraping options stored with every job; anything else comes from the defaults
+JOB_OPTIONS = [
+    "record",
+    "follow",
+    "max_depth",
+    "max_pages",
+    "any_host",
+    "include",
+    "exclude",
+    "modified_since",
+    "engine",
+    "settle",
+    "quorum",
+    "wait_timeout",
+    "wait_until",
+    "scroll",
+    "scroll_items",
+    "scroll_timeout",
+    "scroll_idle",
+    "block",
+    "block_urls",
+    "storage_state",
+    "reuse_context",
+    "cache",
+    "cache_dir",
+    "cache_ttl",
+    "cache_size",
+    "changes_only",
+    "index_file",
+    "change_key",
+    "compression",
+    "preflight",
+    "check_concurrency",
+    "adaptive",
+    "rate_limit",
+    "retries",
+]
+FILE_EXTENSIONS = {
+    "csv": "csv",
+    "excel": "xlsx",
+    "json": "json",
+    "jsonl": "jsonl",
+    "parquet": "parquet",
+}
+INTERVAL_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    url TEXT,
+    batch TEXT,
+    selectors TEXT NOT NULL,
+    output TEXT NOT NULL,
+    output_file TEXT NOT NULL,
+    interval INTEGER,
+    concurrency INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1,
+    created REAL NOT NULL,
+    last_run REAL,
+    last_success REAL,
+    next_run REAL,
+    last_status TEXT
+)
+"""
+
+
+def parse_interval(value):
+    """
+    Parse a schedule such as 90s, 15m, 2h or 1d into seconds.
+    A bare number is taken as minutes.
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*([smhd]?)\s*", value.lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"invalid interval '{value}' (use e.g. 90s, 15m, 2h or 1d)")
+    return int(match.group(1)) * INTERVAL_UNITS[match.group(2) or "m"]
+
+
+def format_interval(seconds):
+    if not seconds:
+        return "manual"
+    for unit in ["d", "h", "m"]:
+        if seconds % INTERVAL_UNITS[unit] == 0:
+            return f"every {seconds // INTERVAL_UNITS[unit]}{unit}"
+    return f"every {seconds}s"
+
+
+class JobStore:
+    """
+    Named scrape jobs kept in a SQLite database, each with its own URL or URL
+    list, selectors, output, concurrency, scraping options and schedule.
+    """
+
+    def __init__(self, path=DEFAULT_JOB_DB):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute(SCHEMA)
+        columns = {row["name"] for row in self.db.execute("PRAGMA table_info(jobs)")}
+        if "last_success" not in columns:
+            # Databases created before last_success was tracked
+            self.db.execute("ALTER TABLE jobs ADD COLUMN last_success REAL")
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def save(self, name, url, batch, selectors, output, output_file, interval, concurrency, options):
+        """
+        Create or replace a job. A job with an interval becomes due right away.
+        """
+        self.db.execute(
+            "INSERT OR REPLACE INTO jobs (name, url, batch, selectors, output, output_file,"
+            " interval, concurrency, options, created, next_run)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                name,
+                url,
+                batch,
+                selectors,
+                output,
+                output_file,
+                interval,
+                concurrency,
+                json.dumps(options),
+                time.time(),
+                time.time() if interval else None,
+            ),
+        )
+        self.db.commit()
+
+    def get(self, name):
+        row = self.db.execute("SELECT * FROM jobs WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self):
+        return [dict(row) for row in self.db.execute("SELECT * FROM jobs ORDER BY name")]
+
+    def remove(self, name):
+        removed = self.db.execute("DELETE FROM jobs WHERE name = ?", (name,)).rowcount
+        self.db.commit()
+        return removed > 0
+
+    def due_jobs(self, now=None):
+        now = time.time() if now is None else now
+        rows = self.db.execute(
+            "SELECT * FROM jobs WHERE enabled = 1 AND next_run IS NOT NULL AND next_run <= ?"
+            " ORDER BY next_run",
+            (now,),
+        )
+        return [dict(row) for row in rows]
+
+    def next_due(self):
+        """
+        Time at which the next scheduled job becomes due, or None
+        """
+        row = self.db.execute(
+            "SELECT MIN(next_run) FROM jobs WHERE enabled = 1 AND next_run IS NOT NULL"
+        ).fetchone()
+        return row[0]
+
+    def mark_started(self, job):
+        """
+        Record the start of a run. The next run is scheduled from the start
+        time so long runs do not make the schedule drift.
+        """
+        now = time.time()
+        job["started"] = now
+        next_run = now + job["interval"] if job["interval"] else None
+        self.db.execute(
+            "UPDATE jobs SET last_run = ?, next_run = ?, last_status = ? WHERE name = ?",
+            (now, next_run, "running", job["name"]),
+        )
+        self.db.commit()
+
+    def mark_finished(self, job, status):
+        """
+        Record the status of a run. A run that scraped every page counts as
+        the last success, from which --modified-since last-run compares.
+        """
+        if status.split(":")[0] in ("ok", "empty"):
+            self.db.execute(
+                "UPDATE jobs SET last_status = ?, last_success = ? WHERE name = ?",
+                (status, job["started"], job["name"]),
+            )
+        else:
+            self.db.execute(
+                "UPDATE jobs SET last_status = ? WHERE name = ?", (status, job["name"])
+            )
+        self.db.commit()
+
+
+def default_output_file(name, output):
+    return os.path.abspath(f"{name}.{FILE_EXTENSIONS[output]}")
+
+
+def job_options(job, defaults):
+    """
+    Build the scraping options of a job on top of the command line defaults
+    """
+    options = copy.copy(defaults)
+    for key, value in json.loads(job["options"]).items():
+        setattr(options, key, value)
+    options.concurrency = job["concurrency"]
+    options.output = job["output"]
+    options.prompt = False
+    return options
+
+
+async def prepare_job(job, defaults, session):
+    """
+    Build the options, selectors, URLs and metrics of one job run, dropping
+    dead URLs as they are read when the job asks for a preflight.
+    Raises ValueError for selectors that cannot be used.
+    """
+    from extract import get_columns
+    from metrics import RunMetrics
+    from preflight import live_urls
+    from sources import read_url_list
+
+    options = job_options(job, defaults)
+    selectors, options.fields = get_columns(job["selectors"], options.record)
+    urls = (
+        read_url_list(job["batch"], options, job["last_success"]) if job["batch"] else [job["url"]]
+    )
+    run_metrics = RunMetrics()
+    if options.preflight:
+        # Checked while they are scraped, off the event loop (see scrape_urls)
+        urls = live_urls(urls, session, options.check_concurrency, run_metrics)
+    return options, selectors, urls, run_metrics
+
+
+async def export_job(job, options, selectors, results, run_metrics):
+    """
+    Export the results of a job run to its output file.
+    Returns a one line status for the job list.
+    """
+    from changes import open_change_index
+    from writers import write_results
+
+    changes = open_change_index(options)
+    start = time.time()
+    try:
+        rows = await write_results(
+            results,
+            selectors,
+            job["output"],
+            run_metrics,
+            job["output_file"],
+            verbose=False,
+            changes=changes,
+            compression=options.compression,
+        )
+    except Exception as e:
+        return f"error: {e}"
+    finally:
+        if changes is not None:
+            changes.close()
+
+    pages = run_metrics.pages
+    if not pages:
+        status = "empty"
+    elif not run_metrics.failed:
+        status = "ok"
+    elif run_metrics.failed < pages:
+        status = "partial"
+    else:
+        status = "failed"
+    return (
+        f"{status}: {pages - run_metrics.failed}/{pages} pages, {rows} rows"
+        f" in {time.time() - start:.1f}s"
+    )
+
+
+async def run_job(job, defaults, pool, session):
+    """
+    Run one job on the shared browser pool and HTTP session.
+    Returns a one line status for the job list.
+    """
+    from browser import scrape_urls
+    from crawl import crawl_results, open_frontier
+
+    try:
+        options, selectors, urls, run_metrics = await prepare_job(job, defaults, session)
+        if options.follow:
+            seeds = await asyncio.to_thread(list, urls)
+    except Exception as e:
+        return f"error: {e}"
+    if options.follow:
+        frontier = open_frontier(options, seeds)
+        results = crawl_results(frontier, selectors, options, pool, session, run_metrics)
+    else:
+        results = scrape_urls(urls, selectors, options, pool=pool, session=session)
+    return await export_job(job, options, selectors, results, run_metrics)
+
+
+async def run_job_group(jobs, defaults, pool, session, statuses):
+    """
+    Run jobs as one plan: every URL the jobs share is loaded once per set of
+    render options, all their selectors run on the loaded page and each job's
+    rows go to its own exporter. statuses maps each job name to a future that
+    gets the job's status as soon as its export is done.
+    """
+    from coalesce import coalesced_results
+
+    async def queued_results(queue):
+        while (result := await queue.get()) is not None:
+            if isinstance(result, Exception):
+                # The job's URL source failed
+                raise result
+            yield result
+
+    async def export(job, queue, prepared):
+        options, selectors, _, run_metrics = prepared
+        status = await export_job(job, options, selectors, queued_results(queue), run_metrics)
+        statuses[job["name"]].set_result(status)
+        # A failed export stops reading; unblock the planner and drop the rest
+        while not queue.empty():
+            queue.get_nowait()
+
+    runs = []
+    exports = []
+    queues = []
+    try:
+        for job in jobs:
+            try:
+                prepared = await prepare_job(job, defaults, session)
+            except Exception as e:
+                statuses[job["name"]].set_result(f"error: {e}")
+                continue
+            queue = asyncio.Queue(maxsize=prepared[0].concurrency * 2)
+            queues.append(queue)
+            runs.append(prepared)
+            exports.append(asyncio.create_task(export(job, queue, prepared)))
+
+        concurrency = sum(options.concurrency for options, _, _, _ in runs)
+        plan = [(urls, selectors, options) for options, selectors, urls, _ in runs]
+        async for index, result in coalesced_results(plan, pool, session, concurrency):
+            if not exports[index].done():
+                await queues[index].put(result)
+        for queue, task in zip(queues, exports):
+            if not task.done():
+                await queue.put(None)
+        await asyncio.gather(*exports)
+    except Exception as e:
+        for future in statuses.values():
+            if not future.done():
+                future.set_result(f"error: {e}")
+    finally:
+        for task in exports:
+            task.cancel()
+
+
+def start_jobs(jobs, defaults, pool, session):
+    """
+    Start jobs on the shared browser pool and HTTP session. Jobs that load
+    their pages the same way run as one plan so every URL they share is loaded
+    once; crawls and scrolling jobs run on their own.
+    Returns a future per job name resolving to the job's status, and the task
+    running the planned jobs (or None).
+    """
+    from coalesce import render_key
+
+    shared = []
+    futures = {}
+    for job in jobs:
+        options = job_options(job, defaults)
+        if options.follow or render_key(options) is None:
+            futures[job["name"]] = asyncio.create_task(run_job(job, defaults, pool, session))
+        else:
+            shared.append(job)
+
+    if len(shared) == 1:
+        job = shared.pop()
+        futures[job["name"]] = asyncio.create_task(run_job(job, defaults, pool, session))
+    if not shared:
+        return futures, None
+
+    loop = asyncio.get_running_loop()
+    statuses = {job["name"]: loop.create_future() for job in shared}
+    futures.update(statuses)
+    return futures, asyncio.create_task(run_job_group(shared, defaults, pool, session, statuses))
+
+
+async def run_scheduler(store, defaults, pool_size=DEFAULT_POOL_SIZE, names=None, once=False):
+    """
+    Run jobs concurrently on one shared browser pool and HTTP session; jobs
+    started together load the URLs they share once. With names, those jobs
+    are run once. Otherwise due jobs are started as
+    their schedule comes up; once=True runs the jobs that are due now and
+    returns, which suits cron.
+    """
+    from browser import create_pool
+    from static import create_session
+
+    if names:
+        pending = []
+        for name in names:
+            job = store.get(name)
+            if job is None:
+                print(f"ERROR: No job named '{name}'")
+            else:
+                pending.append(job)
+    else:
+        pending = store.due_jobs()
+
+    session = create_session(pool_size=pool_size)
+    running = {}
+    groups = set()
+
+    async with create_pool(defaults, size=pool_size) as pool:
+        try:
+            while True:
+                starting = {}
+                for job in pending:
+                    if job["name"] in running or job["name"] in starting:
+                        continue
+                    print(f"Starting job {job['name']}")
+                    store.mark_started(job)
+                    starting[job["name"]] = job
+                pending = []
+                if starting:
+                    # Jobs starting together share the pages they have in common
+                    futures, group = start_jobs(list(starting.values()), defaults, pool, session)
+                    for name, future in futures.items():
+                        running[name] = (starting[name], future)
+                    if group is not None:
+                        groups.add(group)
+                        group.add_done_callback(groups.discard)
+
+                if not running and (names or once):
+                    break
+
+                wait = POLL_INTERVAL
+                next_due = store.next_due()
+                if next_due is not None:
+                    wait = min(wait, max(0, next_due - time.time()))
+                if running:
+                    await asyncio.wait(
+                        [task for _, task in running.values()],
+                        timeout=wait,
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                else:
+                    await asyncio.sleep(wait)
+
+                for name, (job, task) in list(running.items()):
+                    if task.done():
+                        del running[name]
+                        try:
+                            status = task.result()
+                        except Exception as e:
+                            # A broken job is recorded without stopping the others
+                            status = f"error: {e}"
+                        store.mark_finished(job, status)
+                        prefix = {"ok": "SUCCESS", "partial": "WARNING", "empty": "WARNING"}.get(
+                            status.split(":")[0], "ERROR"
+                        )
+                        print(f"{prefix}: Job {name}: {status}")
+
+                if not (names or once):
+                    pending = store.due_jobs()
+        finally:
+            tasks = [task for _, task in running.values()] + list(groups)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            session.close()
+
+
+def print_jobs(store):
+    jobs = store.list()
+    if not jobs:
+        print("No jobs saved. Add one with --add-job NAME.")
+        return
+
+    print(f"\nJobs in {store.path}:")
+    for job in jobs:
+        print(f"\n{job['name']} ({format_interval(job['interval'])})")
+        print(f"  Source: {job['batch'] or job['url']}")
+        print(f"  Selectors: {job['selectors']}")
+        print(f"  Output: {job['output']} -> {job['output_file']}")
+        print(f"  Concurrency: {job['concurrency']}")
+        options = json.loads(job["options"])
+        if options:
+            print(f"  Options: {', '.join(f'{key}={value}' for key, value in options.items())}")
+        if job["last_run"]:
+            print(f"  Last run: {time.ctime(job['last_run'])} ({job['last_status']})")
+        if job["next_run"]:
+            print(f"  Next run: {time.ctime(job['next_run'])}")
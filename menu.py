@@ -1,6 +1,5 @@
 import json
 import time
-import requests
 from urllib.parse import urlparse
 
 
@@ -25,21 +24,23 @@ def get_url_from_user():
 
         # Test URL accessibility
         print("Testing URL accessibility...")
-        try:
-            response = requests.head(url, timeout=10)
-            if response.status_code == 200:
-                print("SUCCESS: URL is accessible!")
-                return url
-            else:
-                print(f"WARNING: URL returned status code {response.status_code}")
-                proceed = input("Continue anyway? (y/n): ").lower()
-                if proceed == "y":
-                    return url
-        except Exception as e:
-            print(f"WARNING: Could not verify URL ({e})")
-            proceed = input("Continue anyway? (y/n): ").lower()
-            if proceed == "y":
-                return url
+        from preflight import check_url
+        from static import create_session
+
+        with create_session(pool_size=1) as session:
+            result = check_url(session, url)
+        if result["ok"]:
+            print(f"SUCCESS: URL is accessible! ({result['status']} {result['content_type']})")
+            if result["final_url"] != url:
+                print(f"Redirects to: {result['final_url']}")
+            return url
+        elif result["status"] is not None:
+            print(f"WARNING: URL returned status code {result['status']}")
+        else:
+            print(f"WARNING: Could not verify URL ({result['error']})")
+        proceed = input("Continue anyway? (y/n): ").lower()
+        if proceed == "y":
+            return url
 
 
 def print_selector_help():
@@ -121,10 +122,12 @@ def get_output_choice():
     print("  2 - Excel file (output.xlsx)")
     print("  3 - JSON file (output.json)")
     print("  4 - Display in terminal")
-    print("  5 - Custom filename")
+    print("  5 - JSON Lines file (output.jsonl)")
+    print("  6 - Parquet file (output.parquet)")
+    print("  7 - Custom filename")
 
     while True:
-        choice = input("Select an option (1-5): ").strip()
+        choice = input("Select an option (1-7): ").strip()
 
         if choice == "1":
             return "csv"
@@ -135,14 +138,20 @@ def get_output_choice():
         elif choice == "4":
             return "terminal"
         elif choice == "5":
+            return "jsonl"
+        elif choice == "6":
+            return "parquet"
+        elif choice == "7":
             return get_custom_filename()
         else:
-            print("ERROR: Invalid option. Please select 1-5.")
+            print("ERROR: Invalid option. Please select 1-7.")
 
 
-def save_configuration(url, selectors, output_format):
+def save_configuration(url, selectors, output_format, render_settings=None):
     """
-    Save current configuration for future use
+    Save current configuration for future use.
+    render_settings holds the settings of scraplet.RENDER_SETTINGS, such as
+    wait_until and block.
     """
     config = {
         "url": url,
@@ -150,6 +159,7 @@ def save_configuration(url, selectors, output_format):
         "output_format": output_format,
         "timestamp": time.time(),
     }
+    config.update(render_settings or {})
 
     try:
         with open("scraplet_config.json", "w") as f:
@@ -174,9 +184,15 @@ def load_saved_configurations():
         return None
 
 
-def list_saved_configurations():
+# Labels of saved settings whose names don't read well on their own
+SETTING_LABELS = {"block": "Blocked Resources", "block_urls": "Blocked URLs"}
+
+
+def list_saved_configurations(defaults=None):
     """
-    List all saved configurations with details
+    List all saved configurations with details. defaults maps the settings
+    saved with a configuration to their default values; settings saved with
+    another value are shown.
     """
     saved_config = load_saved_configurations()
     if not saved_config:
@@ -190,6 +206,15 @@ def list_saved_configurations():
     print(f"URL: {saved_config['url']}")
     print(f"Selectors: {saved_config['selectors']}")
     print(f"Output Format: {saved_config['output_format']}")
+    for setting, default in (defaults or {}).items():
+        value = saved_config.get(setting, default)
+        if value == default or not (value or default):
+            # An empty list saved for a setting that defaults to None is no change
+            continue
+        label = SETTING_LABELS.get(setting, setting.replace("_", " ").title())
+        if isinstance(value, list):
+            value = ", ".join(value)
+        print(f"{label}: {value}")
     print("=" * 50)
     print("\nTo use this configuration:")
     print("  python scraplet.py --use-saved")
@@ -218,11 +243,60 @@ USAGE:
   python scraplet.py -u URL -s SELECTOR # Command line mode
   python scraplet.py --use-saved        # Use saved configuration
   python scraplet.py --list-configs     # List saved configurations
+  python scraplet.py -b FILE -s SELECTOR # Batch mode (one URL per line, - for stdin)
 
 EXAMPLES:
   python scraplet.py -u https://example.com -s ".title" -o csv
   python scraplet.py -u https://example.com -s ".price||.name" -o json
   python scraplet.py --use-saved
+  python scraplet.py -b urls.txt -s ".title" -o csv -c 8
+  python scraplet.py -b urls.txt -s ".title" -o csv -w 4 --resume
+  python scraplet.py -u https://example.com -s ".title" -e static
+
+POLITENESS:
+  --retries N         - Retry timeouts, 429 and 5xx with jittered backoff (default: 2)
+  --adaptive          - Tune pages in flight per host, up to --concurrency
+  --rate-limit N      - At most N requests per second per host
+
+URL CHECKS:
+  --preflight         - Check batch URLs in parallel first and skip dead ones
+  --check-only        - Only report status and content type of the URL(s)
+  --check-concurrency - URLs checked at the same time (default: 32)
+
+RECORD MODE (-r SELECTOR):
+  python scraplet.py -u URL -r ".card" -s "title=h2||link=a@href||id=@data-id"
+  Every .card becomes one row; fields are name=selector, name=selector@attribute
+  or name=@attribute, and missing fields stay empty in their row.
+
+SCROLLING (--scroll):
+  python scraplet.py -u URL -s ".post" --scroll --scroll-items 500
+  Scrolls until no new content shows up for --scroll-idle ms, --scroll-timeout ms
+  have passed or --scroll-items matches were collected (browser engine only).
+
+COOKIES AND LOGINS:
+  python scraplet.py -b urls.txt -s ".price" --storage-state shop.json --reuse-context
+  --storage-state loads cookies and local storage from a file and saves them back;
+  --reuse-context keeps one warm browser context per site across its pages.
+
+RECORD AND REPLAY:
+  python scraplet.py -u URL -s ".title" --record-har page.har   # record the traffic once
+  python scraplet.py -u URL -s ".price" --replay-har page.har   # replay it offline
+
+HTTP API (--serve):
+  python scraplet.py --serve --pool-size 16
+  curl -X POST localhost:8080/scrape -d '{"url": "URL", "selectors": ".title", "output": "ndjson"}'
+  Requests share one browser; beyond --max-queue requests the API answers 503.
+
+CRAWLING (--follow SELECTOR):
+  python scraplet.py -u URL -s ".item" --follow "a.next" -o csv --max-pages 200
+  Scrapes the pages linked by SELECTOR too, each URL once; limit with --max-depth and
+  --max-pages, and continue an interrupted CSV/JSON Lines crawl with --resume.
+
+SITEMAPS AND LARGE URL LISTS:
+  python scraplet.py -b https://example.com/sitemap.xml -s "h1" --modified-since 7d
+  -b also reads sitemaps, sitemap indexes and gzip/bzip2/xz lists, locally or by URL,
+  one URL at a time. Filter with --include/--exclude REGEX; jobs can use
+  --modified-since last-run to only scrape entries changed since their last successful run.
 
 SELECTOR EXAMPLES:
   .class-name     - Elements with class
@@ -233,10 +307,55 @@ SELECTOR EXAMPLES:
 
 OUTPUT FORMATS:
   csv     - Comma-separated values
-  excel   - Excel spreadsheet
+  excel   - Excel spreadsheet (streamed in batch mode)
   json    - JSON format
+  jsonl   - JSON Lines, one row per line (streamed in batch mode)
+  parquet - Compressed Parquet file (streamed in batch mode, --compression to change zstd)
   terminal- Display in console
 
+ENGINES (-e):
+  browser - Render the page in headless Chromium (default)
+  static  - Download the HTML only, no browser
+  auto    - Try static first, use the browser if a selector is empty
+
+WAITING (--settle):
+  all     - Wait until every selector is present (default)
+  any     - Start extracting as soon as one selector is present
+  quorum  - Wait for --quorum N selectors (default: majority)
+  Use --wait-timeout MS to change the shared deadline and --no-prompt
+  for unattended runs.
+
+PAGE LOADING:
+  --wait-until EVENT  - load (default), domcontentloaded, commit, networkidle
+  --block [TYPES]     - Skip downloading resource types (default: image,media,font)
+  --block-url PATTERN - Abort requests matching a URL pattern (repeatable)
+
+PAGE CACHE:
+  --cache             - Reuse pages stored on disk instead of loading them again
+  --cache-ttl SECONDS - Revalidate cached pages older than this (default: 3600)
+  --cache-size MB     - Maximum cache size (default: 500)
+
+BROWSER DAEMON:
+  --serve-browser     - Keep a warm browser running for later runs to attach to
+  --no-daemon         - Launch a new browser even when the daemon is running
+
+METRICS:
+  --profile                - Print a per-phase timing breakdown at the end
+  --metrics-file FILE      - Append per-page metrics as JSON lines
+  --prometheus-file FILE   - Write run metrics for Prometheus
+
+CHANGES ONLY:
+  --changes-only      - Export only items added, modified or removed since the last run
+  --index-file FILE   - Hash index used to detect changes (default: scraplet_index.db)
+  --change-key COLUMN - Identify items by COLUMN so edits show up as modified
+
+JOBS:
+  --add-job NAME --every 1h - Save the URL/batch, selectors and options as a job
+  --list-jobs               - List jobs with their last and next run
+  --run-jobs [NAME ...]     - Run the named jobs, or run scheduled jobs as they come due
+  --run-due                 - Run the jobs that are due now and exit (for cron)
+  --pool-size N             - Pages open at once across all running jobs (default: 8)
+
 CONFIGURATION MANAGEMENT:
   - Save configurations during interactive mode
   - Use --use-saved to load saved configuration
@@ -0,0 +1,266 @@
+import json
+import os
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Phases are reported in this order; anything else is appended after them
+PHASES = [
+    "preflight",
+    "launch",
+    "context",
+    "cache",
+    "fetch",
+    "parse",
+    "navigation",
+    "wait",
+    "scroll",
+    "extract",
+    "export",
+]
+MAX_SAMPLES = 10000
+
+
+class PageMetrics:
+    """
+    Timings and counters collected while scraping one page
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.counters = Counter()
+        self.elements = {}
+        self.timeouts = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def count_elements(self, columns, missing=()):
+        """
+        Record how many elements each selector matched and which ones timed out
+        """
+        for selector, values in columns.items():
+            self.elements[selector] = len(values or [])
+        self.timeouts.extend(missing)
+
+    def to_dict(self):
+        return {
+            "timings": {name: round(seconds, 6) for name, seconds in self.timings.items()},
+            "counters": dict(self.counters),
+            "elements": self.elements,
+            "timeouts": self.timeouts,
+        }
+
+
+class PhaseStats:
+    """
+    Running statistics for one phase. Percentiles come from a bounded random
+    sample so memory stays flat on long runs.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+        else:
+            index = random.randrange(self.count)
+            if index < MAX_SAMPLES:
+                self.samples[index] = seconds
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": round(self.percentile(0.50), 6),
+            "p99": round(self.percentile(0.99), 6),
+            "max": round(self.max, 6),
+        }
+
+
+class RunMetrics:
+    """
+    Aggregates page metrics over a whole run. Every page can be streamed to a
+    JSON lines file as it completes; the run summary is appended to that file,
+    written as a Prometheus textfile and/or printed as a profile at the end.
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None):
+        self.phases = {}
+        self.counters = Counter()
+        self.elements = Counter()
+        self.timeouts = Counter()
+        self.pages = 0
+        self.failed = 0
+        self.prometheus_path = prometheus_path
+        self._file = open(jsonl_path, "a", encoding="utf-8") if jsonl_path else None
+        self._start = time.perf_counter()
+
+    def _phase_stats(self, name):
+        if name not in self.phases:
+            self.phases[name] = PhaseStats()
+        return self.phases[name]
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a run-level phase such as the export
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phase_stats(name).add(time.perf_counter() - start)
+
+    def add_page(self, result):
+        """
+        Merge the metrics of one scraped page into the run
+        """
+        self.pages += 1
+        if result["error"]:
+            self.failed += 1
+
+        page = result.get("metrics") or {}
+        for name, seconds in page.get("timings", {}).items():
+            self._phase_stats(name).add(seconds)
+        self.counters.update(page.get("counters", {}))
+        self.elements.update(page.get("elements", {}))
+        self.timeouts.update(page.get("timeouts", []))
+
+        if self._file is not None:
+            record = {"type": "page", "url": result["url"], "error": result["error"]}
+            record.update(page)
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def ordered_phases(self):
+        known = [name for name in PHASES if name in self.phases]
+        return known + sorted(name for name in self.phases if name not in PHASES)
+
+    def summary(self):
+        return {
+            "duration": round(time.perf_counter() - self._start, 6),
+            "pages": self.pages,
+            "failed": self.failed,
+            "phases": {name: self.phases[name].to_dict() for name in self.ordered_phases()},
+            "counters": dict(self.counters),
+            "elements": dict(self.elements),
+            "timeouts": dict(self.timeouts),
+        }
+
+    def finish(self, profile=False):
+        """
+        Emit the run summary to every configured destination
+        """
+        summary = self.summary()
+        if self._file is not None:
+            self._file.write(json.dumps({"type": "run", **summary}) + "\n")
+            self._file.close()
+            self._file = None
+        if self.prometheus_path:
+            write_prometheus(self.prometheus_path, summary)
+        if profile:
+            print_profile(summary)
+        return summary
+
+
+def print_profile(summary):
+    """
+    Print a per-phase breakdown of a run summary
+    """
+    print("\nProfile:")
+    print(f"  Run time: {summary['duration']:.3f}s for {summary['pages']} page(s), {summary['failed']} failed")
+    print(f"  {'phase':<12} {'count':>7} {'total s':>10} {'mean ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, stats in summary["phases"].items():
+        print(
+            f"  {name:<12} {stats['count']:>7} {stats['total']:>10.3f} "
+            f"{stats['mean'] * 1000:>10.1f} {stats['p50'] * 1000:>10.1f} "
+            f"{stats['p99'] * 1000:>10.1f} {stats['max'] * 1000:>10.1f}"
+        )
+
+    counters = summary["counters"]
+    if counters:
+        print("  Counters:")
+        for name, value in sorted(counters.items()):
+            print(f"    {name}: {value}")
+    if summary["elements"]:
+        print("  Elements per selector:")
+        for selector, count in summary["elements"].items():
+            timeouts = summary["timeouts"].get(selector, 0)
+            print(f"    {selector}: {count} elements, {timeouts} timeout(s)")
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def write_prometheus(path, summary):
+    """
+    Write a run summary in the Prometheus textfile collector format.
+    The file is replaced atomically so the collector never reads half a file.
+    """
+    lines = [
+        "# HELP scraplet_run_duration_seconds Wall clock duration of the last run.",
+        "# TYPE scraplet_run_duration_seconds gauge",
+        f"scraplet_run_duration_seconds {summary['duration']}",
+        "# HELP scraplet_last_run_timestamp_seconds Unix time the last run finished.",
+        "# TYPE scraplet_last_run_timestamp_seconds gauge",
+        f"scraplet_last_run_timestamp_seconds {time.time():.0f}",
+        "# HELP scraplet_pages Pages processed in the last run.",
+        "# TYPE scraplet_pages gauge",
+        f'scraplet_pages{{status="ok"}} {summary["pages"] - summary["failed"]}',
+        f'scraplet_pages{{status="failed"}} {summary["failed"]}',
+        "# HELP scraplet_phase_seconds Time spent per phase in the last run.",
+        "# TYPE scraplet_phase_seconds summary",
+    ]
+    for name, stats in summary["phases"].items():
+        lines.append(f'scraplet_phase_seconds{{phase="{name}",quantile="0.5"}} {stats["p50"]}')
+        lines.append(f'scraplet_phase_seconds{{phase="{name}",quantile="0.99"}} {stats["p99"]}')
+        lines.append(f'scraplet_phase_seconds_sum{{phase="{name}"}} {stats["total"]}')
+        lines.append(f'scraplet_phase_seconds_count{{phase="{name}"}} {stats["count"]}')
+
+    lines.append("# HELP scraplet_counter Counters collected in the last run.")
+    lines.append("# TYPE scraplet_counter gauge")
+    for name, value in sorted(summary["counters"].items()):
+        lines.append(f'scraplet_counter{{name="{_label(name)}"}} {value}')
+
+    lines.append("# HELP scraplet_selector_elements Elements matched per selector in the last run.")
+    lines.append("# TYPE scraplet_selector_elements gauge")
+    for selector, count in summary["elements"].items():
+        lines.append(f'scraplet_selector_elements{{selector="{_label(selector)}"}} {count}')
+
+    lines.append("# HELP scraplet_selector_timeouts Pages where a selector never appeared in the last run.")
+    lines.append("# TYPE scraplet_selector_timeouts gauge")
+    for selector, count in summary["timeouts"].items():
+        lines.append(f'scraplet_selector_timeouts{{selector="{_label(selector)}"}} {count}')
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
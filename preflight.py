@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+DEFAULT_CHECK_CONCURRENCY = 32
+CHECK_TIMEOUT = 10
+CHECK_COLUMNS = ["url", "status", "content_type", "final_url", "elapsed_ms", "error"]
+
+# Statuses some servers answer HEAD with even though GET works
+HEAD_REJECTED = {403, 405, 501}
+
+
+def check_url(session, url, timeout=CHECK_TIMEOUT):
+    """
+    Check that a URL answers, following redirects. A HEAD request is tried
+    first; servers that reject HEAD get a GET whose body is never downloaded.
+    Returns a dictionary with the status, content type, final URL and any error.
+    """
+    result = {
+        "url": url,
+        "status": None,
+        "content_type": "",
+        "final_url": "",
+        "elapsed_ms": 0,
+        "error": "",
+        "ok": False,
+    }
+    start = time.perf_counter()
+    try:
+        response = session.head(url, timeout=timeout, allow_redirects=True)
+        if response.status_code in HEAD_REJECTED:
+            response = session.get(url, timeout=timeout, allow_redirects=True, stream=True)
+            response.close()
+    except Exception as e:
+        result["error"] = str(e)
+    else:
+        result["status"] = response.status_code
+        result["content_type"] = response.headers.get("content-type", "").split(";")[0].strip()
+        result["final_url"] = response.url
+        result["ok"] = response.status_code < 400
+        if not result["ok"]:
+            result["error"] = f"HTTP {response.status_code}"
+    result["elapsed_ms"] = round((time.perf_counter() - start) * 1000)
+    return result
+
+
+def check_urls(urls, session, concurrency=DEFAULT_CHECK_CONCURRENCY):
+    """
+    Check URLs concurrently over one pooled session and yield each result as
+    soon as it is ready. URLs are consumed lazily with at most twice
+    `concurrency` checks in flight, so any number of URLs can be streamed.
+    """
+    url_iter = iter(urls)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = set()
+        while True:
+            for url in url_iter:
+                pending.add(executor.submit(check_url, session, url))
+                if len(pending) >= concurrency * 2:
+                    break
+            if not pending:
+                return
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+
+
+def live_urls(urls, session, concurrency=DEFAULT_CHECK_CONCURRENCY, metrics=None):
+    """
+    Check every URL and yield the ones that answered as their checks finish,
+    reporting the rest, so scraping starts with the first live URL. Order
+    follows completion, not the input. The preflight phase of the metrics
+    spans the whole check, which runs alongside the scrape.
+    """
+    alive = 0
+    dropped = 0
+    phase = metrics.phase("preflight") if metrics is not None else nullcontext()
+    try:
+        with phase:
+            for result in check_urls(urls, session, concurrency):
+                if result["ok"]:
+                    alive += 1
+                    yield result["url"]
+                else:
+                    dropped += 1
+                    print(f"ERROR: Dropping {result['url']}: {result['error']}")
+    finally:
+        if metrics is not None:
+            metrics.counters["preflight_dropped"] += dropped
+    if dropped:
+        print(f"WARNING: Dropped {dropped} dead URL(s), kept {alive}")
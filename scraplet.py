@@ -1,5 +1,7 @@
 import argparse
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import asyncio
+import os
+import re
 import sys
 import time
 import warnings
@@ -14,19 +16,86 @@ from menu import (
     save_configuration,
     load_saved_configurations,
     show_help,
-    handle_selector_error,
     show_scraping_summary,
     list_saved_configurations,
 )
-import pandas as pd
-import json
-from itertools import zip_longest
+from browser import (
+    DEFAULT_BLOCKED_RESOURCES,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_SCROLL_IDLE,
+    DEFAULT_SCROLL_TIMEOUT,
+    ENGINES,
+    RESOURCE_TYPES,
+    SELECTOR_TIMEOUT,
+    SETTLE_STRATEGIES,
+    WAIT_UNTIL,
+    scrape_single,
+    scrape_urls,
+)
+from daemon import DEFAULT_DAEMON_PORT, serve_browser
+from cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB, DEFAULT_CACHE_TTL
+from changes import DEFAULT_INDEX_FILE, open_change_index
+from crawl import DEFAULT_MAX_PAGES, run_crawl
+from metrics import RunMetrics
+from shards import run_sharded
+from sources import LAST_RUN, is_remote, parse_since, read_url_list
+from preflight import CHECK_COLUMNS, DEFAULT_CHECK_CONCURRENCY, check_urls, live_urls
+from static import create_session
+from throttle import DEFAULT_RETRIES
+from jobs import (
+    DEFAULT_JOB_DB,
+    DEFAULT_POOL_SIZE,
+    JOB_OPTIONS,
+    JobStore,
+    default_output_file,
+    parse_interval,
+    print_jobs,
+    run_scheduler,
+)
+from server import DEFAULT_MAX_QUEUE, DEFAULT_SERVE_HOST, DEFAULT_SERVE_PORT, serve
+from extract import get_columns
+from writers import (
+    CHANGE_COLUMNS,
+    COMPRESSIONS,
+    DEFAULT_COMPRESSION,
+    WRITERS,
+    export_data,
+    open_writer,
+    rows_to_columns,
+    write_results,
+)
 
 
-def get_scraping_params():
+# Settings stored alongside the URL/selectors/output of a saved configuration
+RENDER_SETTINGS = [
+    "record",
+    "scroll",
+    "wait_until",
+    "block",
+    "block_urls",
+    "storage_state",
+    "reuse_context",
+]
+
+
+def resource_types(value):
     """
-    Get URL, selector, and output format from user via menu or command line.
-    Returns a tuple: (args, using_saved_config)
+    Parse a comma separated list of resource types for --block
+    """
+    types = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [item for item in types if item not in RESOURCE_TYPES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown resource type(s): {', '.join(unknown)} "
+            f"(choose from {', '.join(RESOURCE_TYPES)})"
+        )
+    return types
+
+
+def build_parser():
+    """
+    Build the command line parser. Its defaults are the scraping options used
+    whenever a setting is not given explicitly.
     """
     parser = argparse.ArgumentParser(
         description="Scraplet: Extract HTML elements using css selectors"
@@ -40,9 +109,25 @@ def get_scraping_params():
     parser.add_argument(
         "-o",
         "--output",
-        choices=["csv", "excel", "json", "terminal"],
+        choices=["csv", "excel", "json", "jsonl", "parquet", "terminal"],
         help="Output format",
     )
+    parser.add_argument(
+        "-r",
+        "--record",
+        metavar="SELECTOR",
+        help="Record mode: every element matching SELECTOR becomes one row and "
+        "-s lists its fields as name=selector, name=selector@attribute or name=@attribute",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=ENGINES,
+        default="browser",
+        help="browser renders pages in Chromium, static only downloads the HTML, "
+        "auto tries static first and falls back to the browser when a selector "
+        "comes back empty (default: browser)",
+    )
     parser.add_argument(
         "--help-mode", action="store_true", help="Show detailed help information"
     )
@@ -52,8 +137,525 @@ def get_scraping_params():
     parser.add_argument(
         "--list-configs", action="store_true", help="List saved configurations"
     )
+    parser.add_argument(
+        "-b",
+        "--batch",
+        metavar="FILE",
+        help="Scrape every URL listed in FILE or at a URL: one URL per line ('-' for stdin), "
+        "a sitemap or a sitemap index, optionally gzip, bzip2 or xz compressed",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="REGEX",
+        help="Only scrape batch URLs matching REGEX (repeatable; any may match)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="REGEX",
+        help="Skip batch URLs matching REGEX (repeatable)",
+    )
+    parser.add_argument(
+        "--modified-since",
+        metavar="WHEN",
+        help="Skip sitemap entries whose lastmod is older than WHEN: a date such as "
+        f"2024-05-01, an age such as 7d or 12h, or {LAST_RUN} (jobs only) for the "
+        "job's last successful run",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Number of pages scraped at the same time in batch mode (default: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--follow",
+        metavar="SELECTOR",
+        help="Crawl: also scrape the pages linked by elements matching SELECTOR "
+        "(e.g. a next-page link), starting from the URL or batch",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        metavar="N",
+        help="Follow links at most N hops away from the start URLs (default: no limit)",
+    )
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        default=DEFAULT_MAX_PAGES,
+        metavar="N",
+        help=f"Stop a crawl after N pages (default: {DEFAULT_MAX_PAGES})",
+    )
+    parser.add_argument(
+        "--any-host",
+        action="store_true",
+        help="Follow links to any host instead of only the start URLs' hosts",
+    )
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="Check every batch URL over a pooled HTTP session first and skip dead ones",
+    )
+    parser.add_argument(
+        "--check-only",
+        action="store_true",
+        help="Only check that the URL or batch URLs answer, reporting status and content type",
+    )
+    parser.add_argument(
+        "--check-concurrency",
+        type=int,
+        default=DEFAULT_CHECK_CONCURRENCY,
+        help=f"URLs checked at the same time (default: {DEFAULT_CHECK_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Split the batch across this many processes, each with its own browser (default: 1)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted batch or crawl, skipping URLs already exported "
+        "(CSV and JSON Lines)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Tune the pages in flight per host from latency and errors, "
+        "with --concurrency as the ceiling",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        metavar="N",
+        help="Start at most N requests per second to any one host",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f"Retry timeouts, connection errors, 429 and 5xx responses this many times "
+        f"with jittered backoff (default: {DEFAULT_RETRIES})",
+    )
+    parser.add_argument(
+        "--settle",
+        choices=SETTLE_STRATEGIES,
+        default="all",
+        help="Start extracting once all, any or a quorum of the selectors are "
+        "present on the page (default: all)",
+    )
+    parser.add_argument(
+        "--quorum",
+        type=int,
+        help="Number of selectors required by --settle quorum (default: majority)",
+    )
+    parser.add_argument(
+        "--wait-timeout",
+        type=int,
+        default=SELECTOR_TIMEOUT,
+        metavar="MS",
+        help=f"Shared deadline for all selectors to appear, in milliseconds (default: {SELECTOR_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--scroll",
+        action="store_true",
+        help="Scroll the page and collect items as they load (infinite scroll, lazy loading)",
+    )
+    parser.add_argument(
+        "--scroll-items",
+        type=int,
+        metavar="N",
+        help="Stop scrolling once N items are found (default: no limit)",
+    )
+    parser.add_argument(
+        "--scroll-timeout",
+        type=int,
+        default=DEFAULT_SCROLL_TIMEOUT,
+        metavar="MS",
+        help=f"Stop scrolling after MS milliseconds (default: {DEFAULT_SCROLL_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--scroll-idle",
+        type=int,
+        default=DEFAULT_SCROLL_IDLE,
+        metavar="MS",
+        help=f"Stop scrolling when no new item appeared for MS milliseconds (default: {DEFAULT_SCROLL_IDLE})",
+    )
+    parser.add_argument(
+        "--wait-until",
+        choices=WAIT_UNTIL,
+        default="load",
+        help="Navigation event to wait for before extracting (default: load)",
+    )
+    parser.add_argument(
+        "--block",
+        type=resource_types,
+        nargs="?",
+        const=DEFAULT_BLOCKED_RESOURCES,
+        default=[],
+        metavar="TYPES",
+        help="Comma separated resource types the browser should not download "
+        f"(default when given without a value: {','.join(DEFAULT_BLOCKED_RESOURCES)})",
+    )
+    parser.add_argument(
+        "--block-url",
+        dest="block_urls",
+        action="append",
+        metavar="PATTERN",
+        help="Abort requests whose URL contains PATTERN (globs like *tracker* are "
+        "supported). Can be repeated",
+    )
+    parser.add_argument(
+        "--storage-state",
+        metavar="FILE",
+        help="Start browser contexts with the cookies and local storage saved in FILE "
+        "and save them back at the end of the run",
+    )
+    parser.add_argument(
+        "--reuse-context",
+        action="store_true",
+        help="Keep one warm browser context per site and reuse it for every page on that site",
+    )
+    parser.add_argument(
+        "--record-har",
+        metavar="FILE",
+        help="Record the network traffic of every browser page into the HAR archive FILE",
+    )
+    parser.add_argument(
+        "--replay-har",
+        metavar="FILE",
+        help="Serve every browser request from the HAR archive FILE without going online",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Serve pages from the on-disk page cache and store new ones in it",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directory of the page cache (default: {DEFAULT_CACHE_DIR})",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=int,
+        default=DEFAULT_CACHE_TTL,
+        metavar="SECONDS",
+        help="Age after which cached pages are revalidated with the server "
+        f"(default: {DEFAULT_CACHE_TTL})",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE_MB,
+        metavar="MB",
+        help=f"Maximum size of the page cache (default: {DEFAULT_CACHE_SIZE_MB})",
+    )
+    parser.add_argument(
+        "--serve-browser",
+        action="store_true",
+        help="Run a warm browser daemon that later runs attach to instead of "
+        "launching Chromium",
+    )
+    parser.add_argument(
+        "--daemon-port",
+        type=int,
+        default=DEFAULT_DAEMON_PORT,
+        help=f"Port of the browser daemon started by --serve-browser (default: {DEFAULT_DAEMON_PORT})",
+    )
+    parser.add_argument(
+        "--no-daemon",
+        dest="daemon",
+        action="store_false",
+        help="Always launch a new browser, even when a browser daemon is running",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=COMPRESSIONS,
+        help=f"Compression codec for Parquet output (default: {DEFAULT_COMPRESSION})",
+    )
+    parser.add_argument(
+        "--output-file",
+        metavar="FILE",
+        help="Write the output to FILE instead of output.<extension>",
+    )
+    parser.add_argument(
+        "--changes-only",
+        action="store_true",
+        help="Only export items added, modified or removed since the last run",
+    )
+    parser.add_argument(
+        "--index-file",
+        metavar="FILE",
+        default=DEFAULT_INDEX_FILE,
+        help=f"Content hash index used by --changes-only (default: {DEFAULT_INDEX_FILE})",
+    )
+    parser.add_argument(
+        "--change-key",
+        metavar="COLUMN",
+        help="Identify items by the value of COLUMN (a selector, or a field in record mode) so "
+        "--changes-only reports edited items as modified; by default items are identified "
+        "by their content",
+    )
+    parser.add_argument(
+        "--add-job",
+        metavar="NAME",
+        help="Save the given URL or batch, selectors, output and options as a named job",
+    )
+    parser.add_argument(
+        "--every",
+        metavar="INTERVAL",
+        help="Schedule for --add-job such as 30s, 15m, 2h or 1d (default: run only on demand)",
+    )
+    parser.add_argument("--list-jobs", action="store_true", help="List saved jobs")
+    parser.add_argument("--remove-job", metavar="NAME", help="Delete a saved job")
+    parser.add_argument(
+        "--run-jobs",
+        nargs="*",
+        metavar="NAME",
+        help="Run the named jobs once, or keep running scheduled jobs as they come due "
+        "when no name is given",
+    )
+    parser.add_argument(
+        "--run-due",
+        action="store_true",
+        help="Run the scheduled jobs that are due now and exit (for cron)",
+    )
+    parser.add_argument(
+        "--job-db",
+        metavar="FILE",
+        default=DEFAULT_JOB_DB,
+        help=f"SQLite database holding the jobs (default: {DEFAULT_JOB_DB})",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help="Pages open at the same time across all running jobs or API requests "
+        f"(default: {DEFAULT_POOL_SIZE})",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run an HTTP API that scrapes the URLs and selectors posted to it on one "
+        "shared browser; other options on the command line become its defaults",
+    )
+    parser.add_argument(
+        "--serve-host",
+        default=DEFAULT_SERVE_HOST,
+        help=f"Address the API listens on (default: {DEFAULT_SERVE_HOST})",
+    )
+    parser.add_argument(
+        "--serve-port",
+        type=int,
+        default=DEFAULT_SERVE_PORT,
+        help=f"Port the API listens on (default: {DEFAULT_SERVE_PORT})",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=DEFAULT_MAX_QUEUE,
+        help="Requests the API accepts at the same time before answering 503 "
+        f"(default: {DEFAULT_MAX_QUEUE})",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print a per-phase timing breakdown at the end of the run",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="Append per-page and per-run metrics to FILE as JSON lines",
+    )
+    parser.add_argument(
+        "--prometheus-file",
+        metavar="FILE",
+        help="Write run metrics to FILE in the Prometheus textfile format",
+    )
+    parser.add_argument(
+        "--no-prompt",
+        dest="prompt",
+        action="store_false",
+        help="Never stop for input: skip selector retries and the save prompt",
+    )
+    return parser
+
+
+def apply_saved_configuration(args, saved_config, parser):
+    """
+    Copy a saved configuration into the parsed arguments.
+    Render settings given explicitly on the command line take precedence.
+    """
+    args.url = saved_config["url"]
+    args.selector = saved_config["selectors"]
+    args.output = saved_config["output_format"]
+    for setting in RENDER_SETTINGS:
+        if setting in saved_config and getattr(args, setting) == parser.get_default(setting):
+            setattr(args, setting, saved_config[setting])
+
+
+def add_job(args, parser, store):
+    """
+    Save the URL or batch, selectors, output and options on the command line
+    as a named job. Only options that differ from the defaults are stored.
+    """
+    if not (args.url or args.batch) or not args.selector:
+        parser.error("--add-job needs --url or --batch and --selector")
+    if args.batch == "-":
+        parser.error("--add-job cannot read URLs from stdin")
+    if args.output in (None, "terminal"):
+        parser.error("--add-job needs a file --output format")
+    try:
+        get_columns(args.selector, args.record)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        interval = parse_interval(args.every) if args.every else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    options = {
+        option: getattr(args, option)
+        for option in JOB_OPTIONS
+        if getattr(args, option) != parser.get_default(option)
+    }
+    if args.changes_only:
+        options["index_file"] = os.path.abspath(args.index_file)
+    if args.storage_state:
+        options["storage_state"] = os.path.abspath(args.storage_state)
+    output_file = (
+        os.path.abspath(args.output_file)
+        if args.output_file
+        else default_output_file(args.add_job, args.output)
+    )
+    store.save(
+        args.add_job,
+        args.url,
+        args.batch if not args.batch or is_remote(args.batch) else os.path.abspath(args.batch),
+        args.selector,
+        args.output,
+        output_file,
+        interval,
+        args.concurrency,
+        options,
+    )
+    print(f"SUCCESS: Job '{args.add_job}' saved to {store.path}")
+
+
+def handle_jobs(args, parser):
+    """
+    Add, list, remove or run the jobs in the job database
+    """
+    if args.pool_size < 1:
+        parser.error("--pool-size must be at least 1")
+
+    store = JobStore(args.job_db)
+    try:
+        if args.add_job:
+            add_job(args, parser, store)
+        if args.remove_job:
+            if store.remove(args.remove_job):
+                print(f"SUCCESS: Job '{args.remove_job}' removed")
+            else:
+                print(f"ERROR: No job named '{args.remove_job}'")
+        if args.list_jobs:
+            print_jobs(store)
+        if args.run_jobs is not None or args.run_due:
+            defaults = parser.parse_args([])
+            defaults.daemon = args.daemon
+            try:
+                asyncio.run(
+                    run_scheduler(
+                        store,
+                        defaults,
+                        args.pool_size,
+                        names=args.run_jobs,
+                        once=args.run_due,
+                    )
+                )
+            except KeyboardInterrupt:
+                print("\nScheduler stopped.")
+    finally:
+        store.close()
+
+
+def get_scraping_params():
+    """
+    Get URL, selector, and output format from user via menu or command line.
+    Returns a tuple: (args, using_saved_config)
+    """
+    parser = build_parser()
     args = parser.parse_args()
 
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.quorum is not None and args.quorum < 1:
+        parser.error("--quorum must be at least 1")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.batch == "-" and (args.workers > 1 or args.resume):
+        parser.error("--workers and --resume need a URL file, not stdin")
+    if args.scroll and args.engine == "static":
+        parser.error("--scroll needs the browser or auto engine")
+    if args.scroll_items is not None and args.scroll_items < 1:
+        parser.error("--scroll-items must be at least 1")
+    if args.engine == "static" and (args.storage_state or args.reuse_context):
+        parser.error("--storage-state and --reuse-context need the browser or auto engine")
+    if args.record_har and args.replay_har:
+        parser.error("--record-har and --replay-har cannot be combined")
+    if args.engine == "static" and (args.record_har or args.replay_har):
+        parser.error("--record-har and --replay-har need the browser or auto engine")
+    if args.record_har and (args.cache or args.workers > 1):
+        parser.error("--record-har cannot be combined with --cache or --workers")
+    if args.replay_har and not os.path.isfile(args.replay_har):
+        parser.error(f"HAR archive not found: {args.replay_har}")
+    if args.replay_har:
+        # A replayed page answers the same way every time, so retrying is pointless
+        args.retries = 0
+    if args.retries < 0:
+        parser.error("--retries cannot be negative")
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        parser.error("--rate-limit must be positive")
+    if args.check_concurrency < 1:
+        parser.error("--check-concurrency must be at least 1")
+    if args.preflight and (args.workers > 1 or args.resume):
+        parser.error("--preflight cannot be combined with --workers or --resume")
+    if args.follow and (args.workers > 1 or args.preflight):
+        parser.error("--follow cannot be combined with --workers or --preflight")
+    if args.max_depth is not None and args.max_depth < 0:
+        parser.error("--max-depth cannot be negative")
+    if args.max_pages < 1:
+        parser.error("--max-pages must be at least 1")
+    if args.resume and args.output not in (None, "csv", "jsonl"):
+        parser.error("--resume only works with csv or jsonl output")
+    for pattern in (args.include or []) + (args.exclude or []):
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            parser.error(f"invalid pattern '{pattern}': {e}")
+    if args.modified_since == LAST_RUN and not args.add_job:
+        parser.error(f"--modified-since {LAST_RUN} only works for jobs (--add-job)")
+    try:
+        parse_since(args.modified_since)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.change_key and not args.changes_only:
+        parser.error("--change-key needs --changes-only")
+    if args.change_key and args.selector:
+        try:
+            columns = get_columns(args.selector, args.record)[0]
+        except ValueError:
+            # Reported once the selectors are used
+            columns = [args.change_key]
+        if args.change_key not in columns:
+            parser.error(f"--change-key must be one of the columns: {', '.join(columns)}")
+
     # Show help if requested
     if args.help_mode:
         show_help()
@@ -61,11 +663,47 @@ def get_scraping_params():
 
     # List saved configurations if requested
     if args.list_configs:
-        list_saved_configurations()
+        list_saved_configurations(
+            {setting: parser.get_default(setting) for setting in RENDER_SETTINGS}
+        )
+        sys.exit(0)
+
+    # Run the browser daemon if requested
+    if args.serve_browser:
+        try:
+            asyncio.run(serve_browser(args.daemon_port))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    # Run the scrape API if requested
+    if args.serve:
+        if args.pool_size < 1 or args.max_queue < 1:
+            parser.error("--pool-size and --max-queue must be at least 1")
+        try:
+            asyncio.run(
+                serve(args, args.serve_host, args.serve_port, args.pool_size, args.max_queue)
+            )
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    # Check URLs without scraping if requested
+    if args.check_only:
+        if not (args.url or args.batch):
+            parser.error("--check-only needs --url or --batch")
+        run_check(args)
+        sys.exit(0)
+
+    # Manage or run saved jobs if requested
+    if args.add_job or args.list_jobs or args.remove_job or args.run_jobs is not None or args.run_due:
+        handle_jobs(args, parser)
         sys.exit(0)
 
     # Check if running in interactive mode (no CLI args provided)
-    interactive_mode = not any([args.url, args.selector, args.output, args.use_saved])
+    interactive_mode = not any(
+        [args.url, args.selector, args.output, args.use_saved, args.batch]
+    )
 
     # If in interactive mode, check for saved configuration
     if interactive_mode:
@@ -80,9 +718,7 @@ def get_scraping_params():
 
             use_saved = input("\nUse saved configuration? (y/n): ").lower()
             if use_saved == "y":
-                args.url = saved_config["url"]
-                args.selector = saved_config["selectors"]
-                args.output = saved_config["output_format"]
+                apply_saved_configuration(args, saved_config, parser)
                 print("Using saved configuration!")
                 return args, True  # Using saved config
 
@@ -90,9 +726,7 @@ def get_scraping_params():
     if args.use_saved:
         saved_config = load_saved_configurations()
         if saved_config:
-            args.url = saved_config["url"]
-            args.selector = saved_config["selectors"]
-            args.output = saved_config["output_format"]
+            apply_saved_configuration(args, saved_config, parser)
             print(
                 f"Using saved configuration from {time.ctime(saved_config['timestamp'])}"
             )
@@ -104,7 +738,7 @@ def get_scraping_params():
             sys.exit(1)
 
     # If parameters are not provided via CLI, prompt the user
-    if not args.url:
+    if not args.url and not args.batch:
         args.url = get_url_from_user()
 
     if not args.selector:
@@ -116,179 +750,230 @@ def get_scraping_params():
     return args, False  # Not using saved config
 
 
-def get_selectors(selector):
-    separator = "||"
-    if separator in selector:
-        selectors = selector.split(separator)
-    else:
-        selectors = [selector]
-    return selectors
-
-
-def export_to_csv(data, filename="output.csv"):
+def run_check(args):
     """
-    Export scraped data to a CSV file.
-    The keys of the dictionary are selectors (columns), and values are the scraped text.
+    Check the URL or every URL of the batch list without scraping them and
+    report status, content type and final URL for each
     """
-    df = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in data.items()]))
-    df.to_csv(filename, index=False)
-    print(f"SUCCESS: Data exported to {filename}")
+    urls = read_url_list(args.batch, args) if args.batch else [args.url]
+    output = args.output or "terminal"
+    print(f"\nChecking URLs from: {args.batch or args.url} ({args.check_concurrency} at a time)")
+
+    writer = None
+    if output in WRITERS:
+        writer = open_writer(output, CHECK_COLUMNS, args.output_file)
+    rows = []
+    alive = dead = 0
+    session = create_session(pool_size=args.check_concurrency)
+    start = time.time()
+    try:
+        for result in check_urls(urls, session, args.check_concurrency):
+            if result["ok"]:
+                alive += 1
+                print(f"SUCCESS: {result['url']} ({result['status']} {result['content_type']})")
+            else:
+                dead += 1
+                print(f"ERROR: {result['url']}: {result['error']}")
+            result.pop("ok")
+            if writer is not None:
+                writer.write_rows([result])
+            else:
+                rows.append(result)
+    finally:
+        session.close()
+        if writer is not None:
+            writer.close()
+    elapsed = time.time() - start
+
+    print(f"\nChecked {alive + dead} URL(s) in {elapsed:.1f}s: {alive} alive, {dead} dead")
+    if writer is not None:
+        print(f"SUCCESS: {writer.rows_written} rows exported to {writer.filename}")
+    elif rows:
+        export_data(rows_to_columns(rows, CHECK_COLUMNS), output, args.output_file)
+    if dead:
+        sys.exit(1)
 
 
-def export_to_excel(data, filename="output.xlsx"):
+def run_batch(args, selectors):
     """
-    Export scraped data to an Excel file.
+    Scrape every URL from the batch list through one shared browser.
+    CSV, JSON Lines and Parquet output is written page by page as results
+    arrive; the other formats need the whole dataset and are exported at the end.
     """
-    df = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in data.items()]))
-    df.to_excel(filename, index=False)
-    print(f"SUCCESS: Data exported to {filename}")
-
+    print(f"\nStarting batch scrape from: {args.batch}")
+    if args.workers > 1:
+        print(
+            f"Using {len(selectors)} selector(s) on {args.workers} worker(s) "
+            f"with {args.concurrency} concurrent page(s) each"
+        )
+    else:
+        print(f"Using {len(selectors)} selector(s) on {args.concurrency} concurrent page(s)")
+    print(f"Output format: {args.output}")
 
-def export_to_json(data, filename="output.json"):
-    """
-    Export scraped data to a JSON file.
-    """
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=4)
-    print(f"SUCCESS: Data exported to {filename}")
+    run_metrics = RunMetrics(args.metrics_file, args.prometheus_file)
+    start = time.time()
+    if args.workers > 1 or args.resume:
+        try:
+            complete = run_sharded(args, selectors, run_metrics)
+        except Exception as e:
+            print(f"ERROR: Batch scrape failed: {e}")
+            sys.exit(1)
+    else:
+        complete = True
+        urls = read_url_list(args.batch, args)
+        session = None
+        if args.preflight:
+            # The checked connections stay open for the static engine
+            session = create_session(pool_size=max(args.check_concurrency, args.concurrency))
+            print(f"Checking URLs ({args.check_concurrency} at a time)...")
+            urls = live_urls(urls, session, args.check_concurrency, run_metrics)
+        results = scrape_urls(urls, selectors, args, session=session)
+        changes = open_change_index(args)
+        try:
+            asyncio.run(
+                write_results(
+                    results,
+                    selectors,
+                    args.output,
+                    run_metrics,
+                    args.output_file,
+                    changes=changes,
+                    compression=args.compression,
+                )
+            )
+        except Exception as e:
+            print(f"ERROR: Batch scrape failed: {e}")
+            sys.exit(1)
+        finally:
+            if changes is not None:
+                changes.close()
+            if session is not None:
+                session.close()
+    elapsed = time.time() - start
+
+    pages = run_metrics.pages
+    print(f"\nScraped {pages - run_metrics.failed}/{pages} pages in {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {pages / elapsed * 60:.0f} pages/min")
+
+    run_metrics.finish(profile=args.profile)
+    if not complete:
+        sys.exit(1)
 
 
-def print_to_terminal(data):
+def run_crawl_mode(args, selectors):
     """
-    Prints the scraped data to the terminal in a well-formatted table.
+    Crawl from the URL or batch through one shared browser, following the
+    --follow links. Rows are exported as pages complete, like a batch.
     """
-    print("\n" + "=" * 60)
-    print("SCRAPED DATA")
-    print("=" * 60)
+    print(f"\nStarting crawl from: {args.url or args.batch}")
+    print(f"Following links matching: {args.follow}")
+    depth = "no depth limit" if args.max_depth is None else f"depth {args.max_depth}"
+    print(f"Limits: {args.max_pages} page(s), {depth}, {args.concurrency} concurrent page(s)")
+    print(f"Output format: {args.output}")
 
-    if not data:
-        print("No data to display.")
-        return
+    run_metrics = RunMetrics(args.metrics_file, args.prometheus_file)
+    start = time.time()
+    try:
+        complete = run_crawl(args, selectors, run_metrics)
+    except Exception as e:
+        print(f"ERROR: Crawl failed: {e}")
+        sys.exit(1)
+    elapsed = time.time() - start
 
-    headers = data.keys()
+    pages = run_metrics.pages
+    print(f"\nScraped {pages - run_metrics.failed}/{pages} pages in {elapsed:.1f}s")
+    if elapsed > 0:
+        print(f"Throughput: {pages / elapsed * 60:.0f} pages/min")
 
-    # Use zip_longest to handle columns of different lengths
-    rows = zip_longest(*data.values(), fillvalue="")
+    run_metrics.finish(profile=args.profile)
+    if not complete:
+        sys.exit(1)
 
-    # Create a formatted table
-    header_line = " | ".join(f"{h:<30}" for h in headers)
-    print(header_line)
-    print("-" * len(header_line))
 
-    for row in rows:
-        row_line = " | ".join(f"{str(item):<30}" for item in row)
-        print(row_line)
+def export_changes_or_data(scraped_data, args):
+    """
+    Export the scraped data, or only what changed since the last run when
+    --changes-only is given
+    """
+    changes = open_change_index(args)
+    if changes is None:
+        export_data(scraped_data, args.output, args.output_file, args.compression)
+        return
 
-    print("=" * 60)
+    try:
+        rows = changes.diff(args.url, scraped_data)
+    finally:
+        changes.close()
+    if rows:
+        print(f"Found {len(rows)} changed item(s)")
+    else:
+        print("SUCCESS: No changes since the last run")
+        if args.output == "terminal":
+            return
+    # An empty export replaces the previous run's changes, which are not new any more
+    columns = ["url"] + CHANGE_COLUMNS + list(scraped_data)
+    export_data(
+        rows_to_columns(rows, columns), args.output, args.output_file, args.compression
+    )
 
 
 def main():
     args, using_saved_config = get_scraping_params()
-    selectors = get_selectors(args.selector)
-    scraped_data = {}
+    try:
+        selectors, args.fields = get_columns(args.selector, args.record)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    if args.follow:
+        run_crawl_mode(args, selectors)
+        return
+
+    if args.batch:
+        run_batch(args, selectors)
+        return
 
     print(f"\nStarting scrape of: {args.url}")
     print(f"Using {len(selectors)} selector(s)")
     print(f"Output format: {args.output}")
 
+    run_metrics = RunMetrics(args.metrics_file, args.prometheus_file)
     try:
-        with sync_playwright() as pw:
-            print("Launching browser...")
-            browser = pw.chromium.launch(headless=True)
-            page = browser.new_page()
-
-            try:
-                print("Loading page...")
-                try:
-                    page.goto(args.url, timeout=30000)
-                    print("SUCCESS: Page loaded successfully!")
-                except PlaywrightTimeoutError:
-                    print("ERROR: Timeout while loading page")
-                    return
-                except Exception as e:
-                    print(f"ERROR: Failed to load URL: {args.url}")
-                    print(f"Error details: {e}")
-                    return
-
-                for i, selector in enumerate(selectors, 1):
-                    print(f"Processing selector {i}/{len(selectors)}: {selector}")
-                    try:
-                        page.wait_for_selector(selector, timeout=10000)
-                        elements = page.query_selector_all(selector)
-
-                        if not elements:
-                            print(f"WARNING: No elements found for: {selector}")
-                            scraped_data[selector] = []
-                        else:
-                            scraped_data[selector] = [
-                                element.inner_text() for element in elements
-                            ]
-                            print(f"SUCCESS: Found {len(elements)} elements")
-
-                    except PlaywrightTimeoutError:
-                        print(f"ERROR: Selector not found: {selector}")
-
-                        # Offer to retry with a different selector
-                        new_selector = handle_selector_error(selector, page)
-                        if new_selector:
-                            try:
-                                page.wait_for_selector(new_selector, timeout=10000)
-                                elements = page.query_selector_all(new_selector)
-                                if elements:
-                                    scraped_data[new_selector] = [
-                                        element.inner_text() for element in elements
-                                    ]
-                                    print(
-                                        f"SUCCESS: Found {len(elements)} elements with new selector"
-                                    )
-                                else:
-                                    scraped_data[new_selector] = []
-                            except:
-                                scraped_data[new_selector] = [
-                                    "ERROR: Selector not found"
-                                ]
-                        else:
-                            scraped_data[selector] = ["ERROR: Selector not found"]
-
-                if not scraped_data:
-                    print(
-                        f"WARNING: No elements found matching selector(s): {args.selector}"
-                    )
-                else:
-                    # Show scraping summary
-                    show_scraping_summary(scraped_data, args.output)
-
-                    # Export data
-                    if args.output == "csv":
-                        export_to_csv(scraped_data)
-                    elif args.output == "excel":
-                        export_to_excel(scraped_data)
-                    elif args.output == "json":
-                        export_to_json(scraped_data)
-                    else:
-                        print_to_terminal(scraped_data)
-
-                    # Ask to save configuration
-                    if not using_saved_config:
-                        save = input(
-                            "\nSave this configuration for future use? (y/n): "
-                        ).lower()
-                        if save == "y":
-                            save_configuration(args.url, args.selector, args.output)
-                    else:
-                        print("\nUsing saved configuration - skipping save prompt.")
-
-            except Exception as e:
-                print(f"ERROR: Browser operation failed: {e}")
-            finally:
-                # Close browser within the Playwright context
-                if "browser" in locals() and browser.is_connected():
-                    browser.close()
-
+        scraped_data = asyncio.run(scrape_single(args.url, selectors, args, run_metrics))
     except Exception as e:
         print(f"ERROR: Failed to initialize Playwright: {e}")
         sys.exit(1)
 
+    if scraped_data is None:
+        run_metrics.finish(profile=args.profile)
+        return
+
+    if not scraped_data:
+        print(f"WARNING: No elements found matching selector(s): {args.selector}")
+        run_metrics.finish(profile=args.profile)
+    else:
+        # Show scraping summary
+        show_scraping_summary(scraped_data, args.output)
+
+        # Export data
+        with run_metrics.phase("export"):
+            export_changes_or_data(scraped_data, args)
+        run_metrics.finish(profile=args.profile)
+
+        # Ask to save configuration
+        if using_saved_config:
+            print("\nUsing saved configuration - skipping save prompt.")
+        elif args.prompt:
+            save = input("\nSave this configuration for future use? (y/n): ").lower()
+            if save == "y":
+                save_configuration(
+                    args.url,
+                    args.selector,
+                    args.output,
+                    {setting: getattr(args, setting) for setting in RENDER_SETTINGS},
+                )
+
 
 if __name__ == "__main__":
     main()
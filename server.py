@@ -0,0 +1,385 @@
+import asyncio
+import copy
+import json
+import signal
+import time
+from urllib.parse import urlsplit
+
+from jobs import DEFAULT_POOL_SIZE
+
+DEFAULT_SERVE_HOST = "127.0.0.1"
+DEFAULT_SERVE_PORT = 8080
+DEFAULT_MAX_QUEUE = 64
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 8 * 1024 * 1024
+READ_TIMEOUT = 30
+
+STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Scraping options a request may set; everything else comes from the server's
+# command line. Options naming files on the server are left out on purpose.
+INT_OPTIONS = [
+    "quorum",
+    "wait_timeout",
+    "scroll_items",
+    "scroll_timeout",
+    "scroll_idle",
+    "cache_ttl",
+    "retries",
+]
+BOOL_OPTIONS = ["scroll", "reuse_context", "cache", "adaptive"]
+SERVE_OPTIONS = (
+    ["record", "engine", "settle", "wait_until", "block", "block_urls", "rate_limit"]
+    + INT_OPTIONS
+    + BOOL_OPTIONS
+)
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request. Returns the method, path and parsed JSON body
+    (None when there is no body).
+    """
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HttpError(413, "request headers too large")
+    except asyncio.IncompleteReadError:
+        raise HttpError(400, "incomplete request")
+
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name:
+            headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HttpError(411, "send the body with a Content-Length")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"request body larger than {MAX_BODY_BYTES} bytes")
+
+    body = None
+    if length:
+        try:
+            body = json.loads(await reader.readexactly(length))
+        except asyncio.IncompleteReadError:
+            raise HttpError(400, "incomplete request body")
+        except ValueError as e:
+            raise HttpError(400, f"invalid JSON body: {e}")
+    return method.upper(), urlsplit(target).path, body
+
+
+async def send_head(writer, status, content_type, extra=None):
+    lines = [
+        f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+        f"Content-Type: {content_type}",
+        "Connection: close",
+    ]
+    lines.extend(f"{name}: {value}" for name, value in (extra or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    await writer.drain()
+
+
+async def send_json(writer, status, payload, extra=None):
+    await send_head(writer, status, "application/json", extra)
+    writer.write(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    await writer.drain()
+
+
+def request_options(body, defaults, pool_size):
+    """
+    Build the scraping options of a request on top of the server defaults,
+    rejecting unknown or malformed options with a 400 error
+    """
+    from browser import ENGINES, RESOURCE_TYPES, SETTLE_STRATEGIES, WAIT_UNTIL
+
+    choices = {"engine": ENGINES, "settle": SETTLE_STRATEGIES, "wait_until": WAIT_UNTIL}
+    options = copy.copy(defaults)
+    requested = body.get("options") or {}
+    if not isinstance(requested, dict):
+        raise HttpError(400, "options must be an object")
+    if "record" in body:
+        requested = {**requested, "record": body["record"]}
+
+    for key, value in requested.items():
+        if key not in SERVE_OPTIONS:
+            raise HttpError(400, f"unknown or disallowed option '{key}'")
+        if key in choices and value not in choices[key]:
+            raise HttpError(400, f"{key} must be one of {', '.join(choices[key])}")
+        if key in INT_OPTIONS and value is not None and (
+            type(value) is not int or value < 0
+        ):
+            raise HttpError(400, f"{key} must be a non-negative integer")
+        if key in BOOL_OPTIONS and not isinstance(value, bool):
+            raise HttpError(400, f"{key} must be true or false")
+        if key == "block" and (
+            not isinstance(value, list) or not set(value) <= set(RESOURCE_TYPES)
+        ):
+            raise HttpError(400, f"block must be a list of: {', '.join(RESOURCE_TYPES)}")
+        if key == "block_urls" and not (
+            value is None or isinstance(value, list) and all(isinstance(v, str) for v in value)
+        ):
+            raise HttpError(400, "block_urls must be a list of strings")
+        if key == "rate_limit" and value is not None and (
+            not isinstance(value, (int, float)) or value <= 0
+        ):
+            raise HttpError(400, "rate_limit must be a positive number")
+        if key == "record" and value is not None and not isinstance(value, str):
+            raise HttpError(400, "record must be a selector")
+        setattr(options, key, value)
+
+    # The same combinations the command line rejects (see get_scraping_params)
+    if options.quorum is not None and options.quorum < 1:
+        raise HttpError(400, "quorum must be at least 1")
+    if options.scroll_items is not None and options.scroll_items < 1:
+        raise HttpError(400, "scroll_items must be at least 1")
+    if options.scroll and options.engine == "static":
+        raise HttpError(400, "scroll needs the browser or auto engine")
+    if options.engine == "static" and (
+        getattr(options, "storage_state", None) or options.reuse_context
+    ):
+        raise HttpError(400, "storage_state and reuse_context need the browser or auto engine")
+
+    concurrency = body.get("concurrency", defaults.concurrency)
+    if type(concurrency) is not int or concurrency < 1:
+        raise HttpError(400, "concurrency must be a positive integer")
+    options.concurrency = min(concurrency, pool_size)
+    options.prompt = False
+    # Recording, replaying and change tracking are run options, not request options
+    options.record_har = None
+    options.replay_har = None
+    options.changes_only = False
+    return options
+
+
+def request_urls(body):
+    urls = body.get("urls") or ([body["url"]] if body.get("url") else [])
+    if not urls or not isinstance(urls, list):
+        raise HttpError(400, "give a url or a list of urls")
+    for url in urls:
+        if not isinstance(url, str) or urlsplit(url).scheme not in ("http", "https"):
+            raise HttpError(400, f"not an http(s) URL: {url!r}")
+    return urls
+
+
+class ScrapeService:
+    """
+    HTTP API running scrape requests on one shared browser pool and HTTP
+    session, so requests pay neither interpreter start-up nor a browser launch.
+    Pages from all requests share the pool's slots, browser or not (see
+    BrowserPool.fetch); at most max_queue requests
+    are admitted at a time and the rest are turned away with 503 so callers
+    can back off. NDJSON responses are written page by page and a slow reader
+    slows down its own scrape rather than buffering results in memory.
+    """
+
+    def __init__(self, defaults, pool, session, pool_size, max_queue=DEFAULT_MAX_QUEUE):
+        self.defaults = defaults
+        self.pool = pool
+        self.session = session
+        self.pool_size = pool_size
+        self.max_queue = max_queue
+        self.active = 0
+        self.served = 0
+        self.rejected = 0
+        self.handlers = set()
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            try:
+                method, path, body = await asyncio.wait_for(read_request(reader), READ_TIMEOUT)
+                await self.route(method, path, body, writer)
+            except asyncio.TimeoutError:
+                await send_json(writer, 408, {"error": "request not received in time"})
+            except HttpError as e:
+                await send_json(writer, e.status, {"error": e.message})
+            except (ConnectionError, asyncio.CancelledError):
+                raise
+            except Exception as e:
+                print(f"ERROR: Request failed: {e}")
+                await send_json(writer, 500, {"error": str(e)})
+        except (ConnectionError, asyncio.CancelledError):
+            # The client went away or the server is stopping
+            pass
+        finally:
+            self.handlers.discard(task)
+            writer.close()
+
+    async def stop(self):
+        """
+        Cancel the requests still in progress
+        """
+        for task in list(self.handlers):
+            task.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+
+    async def route(self, method, path, body, writer):
+        if path == "/health":
+            if method != "GET":
+                raise HttpError(405, "use GET")
+            await send_json(writer, 200, self.status())
+        elif path == "/scrape":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            if not isinstance(body, dict):
+                raise HttpError(400, "send a JSON object with url(s) and selectors")
+            if self.active >= self.max_queue:
+                self.rejected += 1
+                await send_json(
+                    writer, 503, {"error": "too many requests in progress"}, {"Retry-After": 1}
+                )
+                return
+            self.active += 1
+            try:
+                await self.scrape(body, writer)
+            finally:
+                self.active -= 1
+                self.served += 1
+        else:
+            raise HttpError(404, f"no such endpoint: {path}")
+
+    def status(self):
+        return {
+            "status": "ok",
+            "active": self.active,
+            "max_queue": self.max_queue,
+            "pool_size": self.pool_size,
+            "served": self.served,
+            "rejected": self.rejected,
+        }
+
+    async def scrape(self, body, writer):
+        """
+        Scrape the URLs of one request. JSON output answers with every row and
+        error once all pages are done; NDJSON streams one line per row, or per
+        failed page, as each page completes.
+        """
+        from browser import scrape_urls
+        from extract import get_columns
+        from writers import columns_to_rows
+
+        output = body.get("output", "json")
+        if output not in ("json", "ndjson"):
+            raise HttpError(400, "output must be json or ndjson")
+        urls = request_urls(body)
+        options = request_options(body, self.defaults, self.pool_size)
+        selectors = body.get("selectors")
+        if isinstance(selectors, list):
+            selectors = "||".join(selectors)
+        if not isinstance(selectors, str) or not selectors.strip():
+            raise HttpError(400, "give selectors as a string or a list")
+        try:
+            selectors, options.fields = get_columns(selectors, options.record)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+        start = time.perf_counter()
+        results = scrape_urls(urls, selectors, options, pool=self.pool, session=self.session)
+        try:
+            if output == "ndjson":
+                await send_head(writer, 200, "application/x-ndjson")
+                async for result in results:
+                    if result["error"]:
+                        lines = [{"url": result["url"], "error": result["error"]}]
+                    else:
+                        lines = columns_to_rows(result["data"], result["url"])
+                    text = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+                    writer.write(text.encode("utf-8"))
+                    # Waits while the client is behind, which stalls this request's pages
+                    await writer.drain()
+                return
+
+            rows = []
+            errors = []
+            pages = 0
+            async for result in results:
+                pages += 1
+                if result["error"]:
+                    errors.append({"url": result["url"], "error": result["error"]})
+                else:
+                    rows.extend(columns_to_rows(result["data"], result["url"]))
+            await send_json(
+                writer,
+                200,
+                {
+                    "rows": rows,
+                    "errors": errors,
+                    "pages": pages,
+                    "elapsed_ms": round((time.perf_counter() - start) * 1000),
+                },
+            )
+        finally:
+            await results.aclose()
+
+
+async def serve(
+    defaults,
+    host=DEFAULT_SERVE_HOST,
+    port=DEFAULT_SERVE_PORT,
+    pool_size=DEFAULT_POOL_SIZE,
+    max_queue=DEFAULT_MAX_QUEUE,
+):
+    """
+    Run the scrape API on host:port until interrupted. The browser is launched
+    (or the browser daemon attached) up front so the first request finds it warm.
+    """
+    from browser import create_pool
+    from static import create_session
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C still ends the server through KeyboardInterrupt
+            pass
+
+    session = create_session(pool_size=pool_size)
+    async with create_pool(defaults, size=pool_size) as pool:
+        if defaults.engine != "static":
+            try:
+                await pool.start()
+            except Exception as e:
+                print(f"WARNING: Could not start the browser yet ({e})")
+
+        service = ScrapeService(defaults, pool, session, pool_size, max_queue)
+        server = await asyncio.start_server(service.handle, host, port, limit=MAX_HEADER_BYTES)
+        print(f"SUCCESS: Scrape API listening on http://{host}:{port}")
+        print("POST /scrape with url(s) and selectors, GET /health. Press Ctrl+C to stop.")
+        try:
+            await stop.wait()
+        finally:
+            server.close()
+            await service.stop()
+            await server.wait_closed()
+            session.close()
+            print("Scrape API stopped.")
@@ -0,0 +1,331 @@
+import asyncio
+import copy
+import multiprocessing
+import os
+import queue as queue_module
+import sys
+import threading
+import time
+from collections import Counter, defaultdict, deque
+
+MAX_RESTARTS = 3
+POLL_INTERVAL = 1.0
+
+
+def progress_path(filename):
+    return f"{filename}.progress"
+
+
+def load_progress(path):
+    """
+    Read the URL keys (crawl.url_key, in hex) of the URLs completed by an
+    earlier run
+    """
+    keys = set()
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    keys.add(int(line, 16))
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return keys
+
+
+def shard_worker(shard, tasks, selectors, options, results):
+    """
+    Entry point of a worker process. Scrapes the URLs it takes from the shared
+    task queue, with its own browser, until it takes None. Every URL taken is
+    reported before it is scraped, and every result is sent back.
+    """
+    from browser import scrape_urls
+
+    stopping = threading.Event()
+    parent = multiprocessing.parent_process()
+
+    def queued_urls():
+        while not stopping.is_set():
+            try:
+                url = tasks.get(True, POLL_INTERVAL)
+            except queue_module.Empty:
+                if parent is not None and not parent.is_alive():
+                    # Nobody is left to hand out URLs or take the results
+                    return
+                continue
+            if url is None:
+                return
+            results.put(("start", shard, url))
+            yield url
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        try:
+            async for result in scrape_urls(queued_urls(), selectors, options):
+                # Blocks while the exporter is behind, without stalling the event loop
+                await loop.run_in_executor(None, results.put, ("result", shard, result))
+        finally:
+            stopping.set()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        return
+    except Exception as e:
+        results.put(("error", shard, str(e)))
+        sys.exit(1)
+    results.put(("done", shard))
+
+
+class ShardedBatch:
+    """
+    A URL list scraped across worker processes. The list is read once, in
+    this process, and its URLs are handed out through a shared task queue,
+    so each worker takes the next URL when it has room. URLs are tracked by
+    their key (crawl.url_key): URLs in done, or listed twice, are skipped.
+    Workers report the URLs they take; when a worker dies it is restarted
+    and the URLs it had taken are queued again. After the run, outstanding
+    maps the keys of URLs never received to the URLs, failed counts pages
+    that failed, and source_failed tells whether the list could not be read
+    to the end.
+    """
+
+    def __init__(self, source, selectors, options, workers, done=None, progress=None):
+        self.source = source
+        self.selectors = selectors
+        self.options = copy.copy(options)
+        # Every worker owns its browser rather than sharing the daemon's
+        self.options.daemon = False
+        self.workers = workers
+        self.done = set() if done is None else done
+        self.progress = progress
+        self.outstanding = {}
+        self.failed = 0
+        self.source_failed = False
+
+    async def results(self):
+        """
+        Start the workers and yield their results as they arrive. Once a
+        page scraped without error has been consumed its key is added to
+        done and appended to the progress file; failed pages are left for
+        the next run.
+        """
+        from crawl import url_key
+        from sources import ThreadedUrls, read_url_list
+
+        workers = self.workers
+        context = multiprocessing.get_context("spawn")
+        tasks = context.Queue(maxsize=workers * self.options.concurrency * 2)
+        results = context.Queue(maxsize=workers * self.options.concurrency * 2)
+        processes = {}
+        # URLs on the task queue, and the URLs each worker has taken
+        queued = {}
+        taken = defaultdict(dict)
+        restarts = Counter()
+        finished = set()
+        retry = deque()
+        wakeup = asyncio.Event()
+        stoppers = []
+        loop = asyncio.get_running_loop()
+
+        async def put(item):
+            # Gives up the wait now and then so that cancelling never leaves
+            # a thread blocked on a queue nobody reads any more
+            while True:
+                try:
+                    return await loop.run_in_executor(None, tasks.put, item, True, POLL_INTERVAL)
+                except queue_module.Full:
+                    continue
+
+        async def next_url(urls):
+            while True:
+                try:
+                    url = await urls.__anext__()
+                except StopAsyncIteration:
+                    return None
+                key = url_key(url)
+                if key not in self.done and key not in self.outstanding:
+                    self.outstanding[key] = url
+                    return url
+
+        async def feed():
+            urls = ThreadedUrls(read_url_list(self.source, self.options))
+            reading = True
+            while True:
+                if retry:
+                    url = retry.popleft()
+                elif reading:
+                    try:
+                        url = await next_url(urls)
+                    except Exception as e:
+                        print(f"ERROR: Could not read {self.source}: {e}")
+                        self.source_failed = True
+                        url = None
+                    if url is None:
+                        reading = False
+                        continue
+                elif self.outstanding and len(finished) < workers:
+                    # Wait for the last results, or for a dead worker's URLs
+                    wakeup.clear()
+                    await wakeup.wait()
+                    continue
+                else:
+                    break
+                queued[url_key(url)] = url
+                await put(url)
+            for _ in range(workers):
+                await put(None)
+
+        def start(shard):
+            process = context.Process(
+                target=shard_worker,
+                args=(shard, tasks, self.selectors, self.options, results),
+                daemon=True,
+            )
+            process.start()
+            processes[shard] = process
+
+        def check_workers():
+            for shard, process in processes.items():
+                if shard in finished or process.is_alive():
+                    continue
+                retry.extend(
+                    url for key, url in taken.pop(shard, {}).items() if key in self.outstanding
+                )
+                wakeup.set()
+                if restarts[shard] >= MAX_RESTARTS:
+                    print(f"ERROR: Worker {shard} failed {MAX_RESTARTS + 1} times, giving up on it")
+                    finished.add(shard)
+                    continue
+                restarts[shard] += 1
+                print(f"WARNING: Worker {shard} exited with code {process.exitcode}, restarting")
+                start(shard)
+                if feeder.done():
+                    # The stop markers may all have been taken already
+                    stoppers.append(asyncio.create_task(put(None)))
+
+        def check_lost(waiting):
+            # A worker killed right after taking a URL may die before
+            # reporting it. Once any worker died, URLs still counted as
+            # queued over a whole interval in which the queue was empty
+            # are queued again.
+            if not restarts or not tasks.empty():
+                return set()
+            for key in waiting & set(queued):
+                url = queued.pop(key)
+                if key in self.outstanding:
+                    retry.append(url)
+                    wakeup.set()
+            return set(queued)
+
+        for shard in range(workers):
+            start(shard)
+        feeder = asyncio.create_task(feed())
+
+        last_check = time.monotonic()
+        waiting = set()
+        try:
+            while len(finished) < workers:
+                if feeder.done() and feeder.exception() is not None:
+                    raise feeder.exception()
+                if time.monotonic() - last_check > POLL_INTERVAL:
+                    check_workers()
+                    waiting = check_lost(waiting)
+                    last_check = time.monotonic()
+                try:
+                    message = await loop.run_in_executor(None, results.get, True, POLL_INTERVAL)
+                except queue_module.Empty:
+                    continue
+
+                kind, shard = message[:2]
+                if kind == "done":
+                    finished.add(shard)
+                    wakeup.set()
+                elif kind == "error":
+                    print(f"ERROR: Worker {shard}: {message[2]}")
+                elif kind == "start":
+                    key = url_key(message[2])
+                    queued.pop(key, None)
+                    taken[shard][key] = message[2]
+                else:
+                    result = message[2]
+                    key = url_key(result["url"])
+                    taken[shard].pop(key, None)
+                    if key not in self.outstanding:
+                        # Received already, from a URL that was queued again
+                        continue
+                    yield result
+                    self.outstanding.pop(key)
+                    wakeup.set()
+                    if result["error"]:
+                        self.failed += 1
+                        continue
+                    self.done.add(key)
+                    if self.progress is not None:
+                        self.progress.write(f"{key:016x}\n")
+                        self.progress.flush()
+        finally:
+            for task in [feeder] + stoppers:
+                task.cancel()
+            await asyncio.gather(feeder, *stoppers, return_exceptions=True)
+            for process in processes.values():
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+
+
+def run_sharded(args, selectors, run_metrics):
+    """
+    Run a batch across args.workers processes feeding one exporter.
+    For CSV and JSON Lines output the keys of exported URLs are recorded
+    next to the output file, so an interrupted run continues with --resume
+    instead of starting over. Returns True when every URL was processed.
+    """
+    from changes import open_change_index
+    from writers import WRITERS, output_filename, write_results
+
+    appendable = args.output in WRITERS and WRITERS[args.output].appendable
+    done = set()
+    progress = None
+    if appendable:
+        path = progress_path(output_filename(args.output, args.output_file))
+        if args.resume:
+            done = load_progress(path)
+            if done:
+                print(f"Resuming: {len(done)} URL(s) already exported")
+        progress = open(path, "a" if args.resume else "w")
+
+    changes = open_change_index(args)
+    batch = ShardedBatch(args.batch, selectors, args, args.workers, done, progress)
+    try:
+        asyncio.run(
+            write_results(
+                batch.results(),
+                selectors,
+                args.output,
+                run_metrics,
+                args.output_file,
+                changes=changes,
+                append=appendable and args.resume,
+                compression=args.compression,
+            )
+        )
+    finally:
+        if changes is not None:
+            changes.close()
+        if progress is not None:
+            progress.close()
+
+    if batch.outstanding or batch.source_failed:
+        if batch.outstanding:
+            print(f"WARNING: {len(batch.outstanding)} URL(s) were not processed")
+        if appendable:
+            print("Run the same command with --resume to continue.")
+        return False
+    if batch.failed and appendable:
+        # Kept so that --resume only retries the failed pages
+        print("Run the same command with --resume to retry the failed pages.")
+    elif progress is not None:
+        os.remove(progress.name)
+    return True
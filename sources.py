@@ -0,0 +1,249 @@
+import asyncio
+import bz2
+import gzip
+import io
+import lzma
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+# Batch sources are read lazily, one URL at a time, so the first page starts
+# scraping as soon as its URL is read and memory does not grow with the list.
+
+FETCH_TIMEOUT = 60
+MAX_SITEMAP_DEPTH = 5
+SITEMAP_NAMESPACE = re.compile(r"^\{[^}]*\}")
+DECOMPRESSORS = {
+    b"\x1f\x8b": gzip.open,
+    b"BZ": bz2.open,
+    b"\xfd7": lzma.open,
+}
+LAST_RUN = "last-run"
+
+
+def is_remote(source):
+    return source.startswith(("http://", "https://"))
+
+
+def parse_since(value, last_success=None):
+    """
+    Turn a --modified-since value into a UTC datetime: an ISO date or
+    datetime, an age such as 12h or 7d, or "last-run" for the start of a
+    job's last successful run. Returns None when there is nothing to compare
+    with (a job that never succeeded). Raises ValueError for anything else.
+    """
+    from jobs import parse_interval
+
+    if not value:
+        return None
+    if value == LAST_RUN:
+        if not last_success:
+            return None
+        return datetime.fromtimestamp(last_success, timezone.utc)
+    if re.fullmatch(r"\s*\d+\s*[smhd]\s*", value.lower()):
+        return datetime.fromtimestamp(time.time() - parse_interval(value), timezone.utc)
+    try:
+        return parse_lastmod(value)
+    except ValueError:
+        raise ValueError(
+            f"invalid --modified-since '{value}' (use a date such as 2024-05-01, "
+            f"an age such as 12h or 7d, or {LAST_RUN})"
+        )
+
+
+def parse_lastmod(value):
+    """
+    Parse a W3C datetime as used in sitemaps; dates without a time zone are UTC
+    """
+    moment = datetime.fromisoformat(value.strip())
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def open_stream(source, get_session):
+    """
+    Open a local file or a remote URL as a binary stream, transparently
+    decompressing gzip, bzip2 and xz content. get_session returns the HTTP
+    session for remote URLs.
+    """
+    if is_remote(source):
+        response = get_session().get(source, stream=True, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        # Undo any Content-Encoding while streaming, and keep the body readable
+        # from the buffer after the connection has been drained
+        response.raw.decode_content = True
+        response.raw.auto_close = False
+        raw = io.BufferedReader(response.raw)
+    else:
+        raw = open(source, "rb")
+
+    magic = raw.peek(2)[:2]
+    if magic in DECOMPRESSORS:
+        return DECOMPRESSORS[magic](raw)
+    return raw
+
+
+def is_sitemap(stream):
+    """
+    Whether a stream holds XML rather than a list of URLs, judging by its
+    first non-blank byte
+    """
+    head = stream.peek(512) if hasattr(stream, "peek") else b""
+    return head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<")
+
+
+def iter_sitemap(source, get_session, since=None, depth=0, seen=None, stream=None):
+    """
+    Yield the page URLs of a sitemap as they are parsed, following nested
+    sitemap indexes depth first. Entries are discarded once read, so memory
+    stays flat however many entries the sitemap has. Entries and nested
+    sitemaps whose lastmod is older than since are skipped; entries without
+    a lastmod are kept. stream is the sitemap when it is already open.
+    """
+    from xml.etree.ElementTree import ParseError, iterparse
+
+    seen = set() if seen is None else seen
+    if source in seen:
+        return
+    seen.add(source)
+
+    stream = stream or open_stream(source, get_session)
+    nested = []
+    try:
+        root = None
+        entry = {}
+        for event, element in iterparse(stream, events=("start", "end")):
+            tag = SITEMAP_NAMESPACE.sub("", element.tag)
+            if event == "start":
+                if root is None:
+                    root = element
+                if tag in ("url", "sitemap"):
+                    entry = {}
+                continue
+            if tag in ("loc", "lastmod"):
+                entry[tag] = (element.text or "").strip()
+            elif tag in ("url", "sitemap"):
+                url = entry.get("loc")
+                if url and not is_older(entry.get("lastmod"), since):
+                    if tag == "url":
+                        yield url
+                    else:
+                        # Read child sitemaps once this index is closed
+                        nested.append(url)
+                # Drop the entry from the tree
+                root.clear()
+    except ParseError as e:
+        print(f"WARNING: Could not parse sitemap {source}: {e}")
+    finally:
+        stream.close()
+
+    for child in nested:
+        if depth >= MAX_SITEMAP_DEPTH:
+            print(f"WARNING: Skipping sitemap nested too deeply: {child}")
+            continue
+        try:
+            yield from iter_sitemap(child, get_session, since, depth + 1, seen)
+        except Exception as e:
+            print(f"WARNING: Could not read sitemap {child}: {e}")
+
+
+def is_older(lastmod, since):
+    if since is None or not lastmod:
+        return False
+    try:
+        return parse_lastmod(lastmod) < since
+    except ValueError:
+        return False
+
+
+def iter_lines(lines):
+    for line in lines:
+        url = line.strip()
+        if url and not url.startswith("#"):
+            yield url
+
+
+def iter_source(source, get_session, since=None):
+    """
+    Yield the URLs of a batch source: stdin ('-'), or a local or remote file
+    holding either a sitemap (or sitemap index) or one URL per line, any of
+    them possibly compressed
+    """
+    if source == "-":
+        yield from iter_lines(sys.stdin)
+        return
+
+    stream = open_stream(source, get_session)
+    if is_sitemap(stream):
+        yield from iter_sitemap(source, get_session, since, stream=stream)
+        return
+    try:
+        yield from iter_lines(io.TextIOWrapper(stream, encoding="utf-8", errors="replace"))
+    finally:
+        stream.close()
+
+
+class ThreadedUrls:
+    """
+    Async iterator over an iterable of URLs that reads it in a worker thread,
+    so sources that block on disk or network reads (sitemaps fetched over
+    HTTP) never stall the pages in flight. Any number of tasks may wait on it.
+    """
+
+    def __init__(self, urls):
+        self.urls = iter(urls)
+        self._lock = asyncio.Lock()
+        self._read = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        async with self._lock:
+            if self._read is None:
+                self._read = asyncio.ensure_future(asyncio.to_thread(next, self.urls, None))
+            try:
+                # A reader cancelled mid-read leaves the URL to the next one
+                url = await asyncio.shield(self._read)
+            finally:
+                if self._read.done():
+                    self._read = None
+        if url is None:
+            raise StopAsyncIteration
+        return url
+
+
+def read_url_list(source, options=None, last_success=None):
+    """
+    Yield URLs from a batch source lazily (see iter_source). Blank lines and
+    lines starting with '#' are skipped. The options' include and exclude
+    patterns and modified_since date filter the URLs; last_success is the
+    start of the last successful run of a job, for modified_since "last-run".
+    """
+    include = [re.compile(pattern) for pattern in getattr(options, "include", None) or []]
+    exclude = [re.compile(pattern) for pattern in getattr(options, "exclude", None) or []]
+    since = parse_since(getattr(options, "modified_since", None), last_success)
+
+    session = None
+
+    def get_session():
+        # Only sources that fetch sitemaps or lists over HTTP pay for a session
+        nonlocal session
+        if session is None:
+            from static import create_session
+
+            session = create_session(pool_size=1)
+        return session
+
+    try:
+        for url in iter_source(source, get_session, since):
+            if include and not any(pattern.search(url) for pattern in include):
+                continue
+            if any(pattern.search(url) for pattern in exclude):
+                continue
+            yield url
+    finally:
+        if session is not None:
+            session.close()
@@ -0,0 +1,161 @@
+from functools import lru_cache
+
+from extract import URL_ATTRIBUTES
+
+# requests and BeautifulSoup are imported inside the functions that use them so
+# importing this module stays cheap for runs that never fetch static HTML.
+
+FETCH_TIMEOUT = 30
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/136.0 Safari/537.36"
+    ),
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+
+@lru_cache(maxsize=None)
+def html_parser():
+    """
+    The fastest installed BeautifulSoup parser: lxml if available
+    """
+    try:
+        import lxml  # noqa: F401
+
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+def create_session(pool_size=10):
+    """
+    Create an HTTP session that keeps up to pool_size connections alive per host
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def fetch_page(session, url, timeout=FETCH_TIMEOUT):
+    """
+    Download a page without rendering it. Raises for HTTP error statuses.
+    """
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response
+
+
+def parse_html(html):
+    """
+    Parse raw HTML once so several selections can share the document
+    """
+    from bs4 import BeautifulSoup
+
+    return BeautifulSoup(html, html_parser())
+
+
+def document_base(soup, url):
+    """
+    URL that relative links in a document resolve against: its <base href>,
+    itself relative to url, or url when there is none
+    """
+    from urllib.parse import urljoin
+
+    base = soup.find("base", href=True)
+    if base is None or not url:
+        return url
+    return urljoin(url, base["href"].strip())
+
+
+def select_texts(html, selectors):
+    """
+    Apply CSS selectors to raw HTML or a document from parse_html.
+    Returns a dictionary of selector -> list of text. Selectors the parser
+    cannot handle (e.g. Playwright "text=" engines) map to None.
+    """
+    from soupsieve import SelectorSyntaxError
+
+    soup = parse_html(html) if isinstance(html, str) else html
+    columns = {}
+    for selector in selectors:
+        try:
+            columns[selector] = [
+                element.get_text(" ", strip=True) for element in soup.select(selector)
+            ]
+        except SelectorSyntaxError:
+            columns[selector] = None
+    return columns
+
+
+def select_records(html, container, fields, url=None):
+    """
+    Apply record mode to raw HTML or a document from parse_html: every
+    element matching the container selector becomes one row with a value for
+    each field.
+    Returns a dictionary of field name -> list of values, all of equal length.
+    Every column is None when the parser cannot handle the container selector.
+    """
+    from urllib.parse import urljoin
+
+    from soupsieve import SelectorSyntaxError
+
+    soup = parse_html(html) if isinstance(html, str) else html
+    columns = {field["name"]: [] for field in fields}
+    try:
+        records = soup.select(container)
+    except SelectorSyntaxError:
+        return {name: None for name in columns}
+
+    for record in records:
+        for field in fields:
+            element = record
+            if field["selector"]:
+                try:
+                    element = record.select_one(field["selector"])
+                except SelectorSyntaxError:
+                    element = None
+
+            value = ""
+            if element is not None and field["attribute"]:
+                value = element.get(field["attribute"], "")
+                if isinstance(value, list):
+                    # Multi-valued attributes such as class
+                    value = " ".join(value)
+                if value and url and field["attribute"] in URL_ATTRIBUTES:
+                    value = urljoin(url, value)
+            elif element is not None:
+                value = element.get_text(" ", strip=True)
+            columns[field["name"]].append(value)
+    return columns
+
+
+def select_links(html, selector, url):
+    """
+    Absolute URLs of the href of every element matching selector, in page
+    order, from raw HTML or a document from parse_html. Fragments are dropped
+    and so are links that are not http(s).
+    """
+    from urllib.parse import urldefrag, urljoin
+
+    from soupsieve import SelectorSyntaxError
+
+    soup = parse_html(html) if isinstance(html, str) else html
+    try:
+        elements = soup.select(selector)
+    except SelectorSyntaxError:
+        return []
+    links = []
+    for element in elements:
+        href = element.get("href")
+        if href:
+            link = urldefrag(urljoin(url, href.strip()))[0]
+            if link.startswith(("http://", "https://")):
+                links.append(link)
+    return links
@@ -0,0 +1,170 @@
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+DEFAULT_RETRIES = 2
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# A page slower than this multiple of the host's best latency counts as overload
+SLOW_FACTOR = 2.0
+EWMA_WEIGHT = 0.2
+
+# Errors worth retrying: timeouts, dropped connections and overloaded servers
+RETRYABLE = re.compile(
+    r"timeout|timed out|connection|net::ERR_|\b429\b|\b50[0234]\b", re.IGNORECASE
+)
+
+
+def is_retryable(error):
+    return bool(error) and RETRYABLE.search(error) is not None
+
+
+def backoff_delay(attempt):
+    """
+    Full-jitter exponential backoff: a random delay up to base * 2^attempt
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+
+
+class TokenBucket:
+    """
+    Allow `rate` requests per second with bursts of up to `burst` requests
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostLimit:
+    """
+    Number of pages allowed in flight for one host, tuned with AIMD: every
+    healthy page adds 1/limit (about one more page per round of requests),
+    while a retryable error or a latency spike halves the limit, at most once
+    per round trip so one burst of failures does not collapse it to 1.
+    """
+
+    def __init__(self, initial, maximum):
+        self.limit = float(min(initial, maximum))
+        self.maximum = maximum
+        self.in_flight = 0
+        self.latency = None
+        self.best_latency = None
+        self._last_decrease = 0.0
+        self._changed = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._changed:
+                self.in_flight -= 1
+                self._changed.notify_all()
+
+    def record(self, latency, failed):
+        """
+        Feed back the outcome of one page. Returns True when the limit was lowered.
+        """
+        slow = False
+        if latency:
+            self.latency = (
+                latency
+                if self.latency is None
+                else (1 - EWMA_WEIGHT) * self.latency + EWMA_WEIGHT * latency
+            )
+            self.best_latency = min(self.best_latency or self.latency, self.latency)
+            slow = self.latency > SLOW_FACTOR * self.best_latency
+
+        if failed or slow:
+            now = time.monotonic()
+            if now - self._last_decrease < (self.latency or 0):
+                return False
+            self._last_decrease = now
+            self.limit = max(1.0, self.limit / 2)
+            return True
+
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        return False
+
+
+class Throttle:
+    """
+    Per-host politeness and retries for a batch. Every host can get a token
+    bucket capping its request rate and an adaptive limit on its pages in
+    flight; failed pages with retryable errors are tried again after a
+    jittered backoff.
+    """
+
+    def __init__(self, options, initial=None):
+        self.adaptive = getattr(options, "adaptive", False)
+        self.rate = getattr(options, "rate_limit", None)
+        self.retries = getattr(options, "retries", 0)
+        self.maximum = options.concurrency
+        self.initial = initial or max(1, self.maximum // 2)
+        self.limits = {}
+        self.buckets = {}
+
+    def host_limit(self, host):
+        if host not in self.limits:
+            self.limits[host] = HostLimit(self.initial, self.maximum)
+        return self.limits[host]
+
+    def bucket(self, host):
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate)
+        return self.buckets[host]
+
+    async def _attempt(self, host, scrape):
+        if self.rate:
+            await self.bucket(host).acquire()
+        if not self.adaptive:
+            return await scrape(), False
+
+        limit = self.host_limit(host)
+        async with limit.slot():
+            result = await scrape()
+        timings = result["metrics"]["timings"]
+        latency = timings.get("navigation", 0) + timings.get("fetch", 0)
+        return result, limit.record(latency, is_retryable(result["error"]))
+
+    async def run(self, url, scrape):
+        """
+        Scrape a URL through the host's limits, retrying transient failures.
+        scrape is a coroutine function returning a scrape result.
+        """
+        host = urlsplit(url).netloc
+        throttled = 0
+        for attempt in range(self.retries + 1):
+            result, lowered = await self._attempt(host, scrape)
+            throttled += lowered
+            if attempt == self.retries or not is_retryable(result["error"]):
+                break
+            await asyncio.sleep(backoff_delay(attempt))
+
+        counters = result["metrics"]["counters"]
+        if attempt:
+            counters["retries"] = attempt
+        if throttled:
+            counters["throttled"] = throttled
+        return result
@@ -0,0 +1,392 @@
+import csv
+import json
+import os
+from itertools import zip_longest
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+DEFAULT_COMPRESSION = "zstd"
+COMPRESSIONS = ["zstd", "snappy", "gzip", "none"]
+EXCEL_MAX_ROWS = 1048576
+
+# Extra columns written in --changes-only mode, in front of the selectors
+CHANGE_COLUMNS = ["change", "item"]
+
+
+def columns_to_rows(data, url=None):
+    """
+    Turn a dictionary of columns into a list of row dictionaries.
+    Shorter columns are padded with empty strings; every row is tagged with
+    url when one is given.
+    """
+    rows = []
+    for values in zip_longest(*data.values(), fillvalue=""):
+        row = {"url": url} if url is not None else {}
+        row.update(zip(data.keys(), values))
+        rows.append(row)
+    return rows
+
+
+class RowWriter:
+    """
+    Base class for writers that append rows to a file as they arrive instead
+    of holding the whole dataset in memory. Writers that can continue an
+    existing file set appendable and accept append=True.
+    """
+
+    extension = None
+    appendable = False
+
+    def __init__(self, filename, columns, append=False):
+        self.filename = filename
+        self.columns = list(dict.fromkeys(columns))
+        self.rows_written = 0
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvWriter(RowWriter):
+    """
+    Append rows to a CSV file, flushing after every batch so rows already
+    written survive a crash.
+    """
+
+    extension = "csv"
+    appendable = True
+
+    def __init__(self, filename, columns, append=False):
+        super().__init__(filename, columns)
+        has_header = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+        self._file = open(filename, "a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(
+            self._file, fieldnames=self.columns, restval="", extrasaction="ignore"
+        )
+        if not has_header:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesWriter(RowWriter):
+    """
+    Append rows to a newline-delimited JSON file, one object per line.
+    """
+
+    extension = "jsonl"
+    appendable = True
+
+    def __init__(self, filename, columns, append=False):
+        super().__init__(filename, columns)
+        self._file = open(filename, "a" if append else "w", encoding="utf-8")
+
+    def write_rows(self, rows):
+        for row in rows:
+            record = {column: row.get(column, "") for column in self.columns}
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter(RowWriter):
+    """
+    Write rows to a Parquet file in row groups of row_group_size rows, so at
+    most one row group is held in memory. Columns are compressed and
+    dictionary encoded, which shrinks repeated strings such as the url column
+    to a few bytes per row. Parquet files are only readable once their footer
+    is written on close, which happens even when scraping fails.
+    """
+
+    extension = "parquet"
+
+    def __init__(
+        self,
+        filename,
+        columns,
+        append=False,
+        compression=DEFAULT_COMPRESSION,
+        row_group_size=DEFAULT_ROW_GROUP_SIZE,
+    ):
+        if append:
+            raise RuntimeError("Parquet files cannot be appended to")
+        super().__init__(filename, columns)
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError(
+                "Parquet output requires pyarrow. Install it with: pip install pyarrow"
+            )
+
+        self._pa = pa
+        self.row_group_size = row_group_size
+        self._schema = pa.schema([(column, pa.string()) for column in self.columns])
+        self._writer = pq.ParquetWriter(
+            filename,
+            self._schema,
+            compression=compression or DEFAULT_COMPRESSION,
+            use_dictionary=True,
+        )
+        self._buffer = []
+
+    def write_rows(self, rows):
+        self._buffer.extend(rows)
+        self.rows_written += len(rows)
+        while len(self._buffer) >= self.row_group_size:
+            self._flush(self._buffer[: self.row_group_size])
+            self._buffer = self._buffer[self.row_group_size :]
+
+    @staticmethod
+    def _cell(value):
+        # Missing values are nulls; numbers such as statuses fit the string columns as text
+        if value is None or isinstance(value, str):
+            return value
+        return str(value)
+
+    def _flush(self, rows):
+        table = self._pa.Table.from_pylist(
+            [{column: self._cell(row.get(column)) for column in self.columns} for row in rows],
+            schema=self._schema,
+        )
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._buffer:
+            self._flush(self._buffer)
+            self._buffer = []
+        self._writer.close()
+
+
+class ExcelWriter(RowWriter):
+    """
+    Write rows to an Excel workbook with openpyxl's write-only mode, which
+    streams every row to disk so memory stays flat however many rows are
+    written. Rows beyond Excel's limit per sheet continue on a new sheet.
+    """
+
+    extension = "xlsx"
+
+    def __init__(self, filename, columns, append=False):
+        if append:
+            raise RuntimeError("Excel files cannot be appended to")
+        super().__init__(filename, columns)
+        try:
+            from openpyxl import Workbook
+            from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        except ImportError:
+            raise RuntimeError(
+                "Excel output requires openpyxl. Install it with: pip install openpyxl"
+            )
+
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self._workbook = Workbook(write_only=True)
+        self._new_sheet()
+
+    def _new_sheet(self):
+        self._sheet = self._workbook.create_sheet(f"Sheet{len(self._workbook.worksheets) + 1}")
+        self._sheet.append(self.columns)
+        self._sheet_rows = 1
+
+    def _cell(self, value):
+        # Control characters are not allowed in worksheets
+        return self._illegal.sub("", value) if isinstance(value, str) else value
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self._sheet_rows >= EXCEL_MAX_ROWS:
+                self._new_sheet()
+            self._sheet.append([self._cell(row.get(column, "")) for column in self.columns])
+            self._sheet_rows += 1
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._workbook.save(self.filename)
+
+
+WRITERS = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "parquet": ParquetWriter,
+    "excel": ExcelWriter,
+}
+
+
+def output_filename(output, filename=None):
+    """
+    The file a streaming output format is written to, output.<extension> by default
+    """
+    return filename or f"output.{WRITERS[output].extension}"
+
+
+def open_writer(output, columns, filename=None, append=False, compression=None):
+    """
+    Open the streaming writer for an output format.
+    The filename defaults to output.<extension>; compression only applies to Parquet.
+    """
+    if output == "parquet":
+        return ParquetWriter(
+            output_filename(output, filename), columns, append=append, compression=compression
+        )
+    return WRITERS[output](output_filename(output, filename), columns, append=append)
+
+
+def export_to_csv(data, filename="output.csv"):
+    """
+    Export scraped data to a CSV file.
+    The keys of the dictionary are selectors (columns), and values are the scraped text.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(dict([(k, pd.Series(v)) for k, v in data.items()]))
+    df.to_csv(filename, index=False)
+    print(f"SUCCESS: Data exported to {filename}")
+
+
+def export_to_json(data, filename="output.json"):
+    """
+    Export scraped data to a JSON file.
+    """
+    with open(filename, "w") as f:
+        json.dump(data, f, indent=4)
+    print(f"SUCCESS: Data exported to {filename}")
+
+
+def print_to_terminal(data):
+    """
+    Prints the scraped data to the terminal in a well-formatted table.
+    """
+    print("\n" + "=" * 60)
+    print("SCRAPED DATA")
+    print("=" * 60)
+
+    if not data:
+        print("No data to display.")
+        return
+
+    headers = data.keys()
+
+    # Use zip_longest to handle columns of different lengths
+    rows = zip_longest(*data.values(), fillvalue="")
+
+    # Create a formatted table
+    header_line = " | ".join(f"{h:<30}" for h in headers)
+    print(header_line)
+    print("-" * len(header_line))
+
+    for row in rows:
+        row_line = " | ".join(f"{str(item):<30}" for item in row)
+        print(row_line)
+
+    print("=" * 60)
+
+
+def rows_to_columns(rows, columns):
+    """
+    Turn a list of row dictionaries back into a dictionary of columns.
+    Values missing from a row become empty strings.
+    """
+    return {column: [row.get(column, "") for row in rows] for column in columns}
+
+
+def export_data(scraped_data, output, filename=None, compression=None):
+    """
+    Export scraped data in the requested output format.
+    Files are named output.<extension> unless a filename is given.
+    """
+    if output == "csv":
+        export_to_csv(scraped_data, filename or "output.csv")
+    elif output == "json":
+        export_to_json(scraped_data, filename or "output.json")
+    elif output in WRITERS:
+        with open_writer(output, scraped_data.keys(), filename, compression=compression) as writer:
+            writer.write_rows(columns_to_rows(scraped_data))
+        print(f"SUCCESS: Data exported to {writer.filename}")
+    else:
+        print_to_terminal(scraped_data)
+
+
+async def write_results(
+    results,
+    selectors,
+    output,
+    run_metrics,
+    filename=None,
+    verbose=True,
+    changes=None,
+    append=False,
+    compression=None,
+):
+    """
+    Export the results of a batch scrape as they arrive from an async iterator.
+    CSV, JSON Lines, Parquet and Excel rows are written page by page; JSON and
+    terminal output need the whole dataset and are exported once every page is done.
+    With a change index only the items that changed since the last run are
+    exported. With append, streamed rows are added to an existing file.
+    Returns the number of rows exported.
+    """
+    columns = ["url"] + (CHANGE_COLUMNS if changes is not None else []) + list(selectors)
+    writer = None
+    if output in WRITERS:
+        writer = open_writer(output, columns, filename, append, compression)
+        if verbose:
+            print(f"Streaming rows to {writer.filename}")
+
+    kept = []
+    try:
+        async for result in results:
+            run_metrics.add_page(result)
+            if result["error"]:
+                if verbose:
+                    print(f"ERROR: {result['url']}: {result['error']}")
+                continue
+
+            if verbose:
+                print(f"SUCCESS: {result['url']}")
+            if changes is not None:
+                rows = changes.diff(result["url"], result["data"])
+                run_metrics.counters["changed_items"] += len(rows)
+            else:
+                rows = columns_to_rows(result["data"], result["url"])
+            if writer is not None:
+                with run_metrics.phase("export"):
+                    writer.write_rows(rows)
+            else:
+                kept.extend(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        print(f"SUCCESS: {writer.rows_written} rows exported to {writer.filename}")
+        return writer.rows_written
+
+    if not kept:
+        if changes is None:
+            print("WARNING: No elements found on any page")
+            return 0
+        print("SUCCESS: No changes since the last run")
+        if output == "terminal":
+            return 0
+        # An empty export replaces the previous run's changes, which are not new any more
+
+    with run_metrics.phase("export"):
+        export_data(rows_to_columns(kept, columns), output, filename, compression)
+    return len(kept)